@@ -1,10 +1,11 @@
 # agents.py
-from crewai import Agent, LLM
+from crewai import Agent
 
 from config import (
     OLLAMA_BASE_URL,
     OLLAMA_MODEL
 )
+from profiling import TracedLLM
 from tools.financial_tools import (
     fetch_stock_price,
     fetch_stock_history,
@@ -25,7 +26,7 @@ from tools.analysis_tools import (
 )
 
 # Initialize LLMs
-ollama_llm = LLM(
+ollama_llm = TracedLLM(
     model=OLLAMA_MODEL,
     base_url=OLLAMA_BASE_URL,
     temperature=0.7,
@@ -1,18 +1,33 @@
 # api.py
-import sys
 import os
+import sys
 import json
+import time
 import uuid
 import threading
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Literal, Optional
 
 # Import CrewAI logic
-from crew import create_financial_crew
-from config import REPORTS_DIR
+from broker import connect as connect_broker
+from cancellation import CancelToken, JobCancelled, activate as activate_token
+from compression import CompressionMiddleware, decompress, negotiate
+from crew import CrewPool, finished_task_outputs
+from jobs import FINISHED_STATUSES, JobRecord, JobStore, with_result
+from tool_loop import agent_loop_stats
+from tools import compute_pool
+from config import PREFETCH_ENABLED, JOB_BROKER_URL, JOB_DEADLINE_SECONDS, RESPONSE_COMPRESSION_MIN_BYTES
+from prefetch import Prefetcher
+from reports import (
+    save_report, save_partial_report, report_id, parse_report_id, report_files, find_report, read_raw, load_report, stored_encoding,
+)
+from profiling import Trace, activate, span
+from scheduler import Scheduler
+import metrics
 
 # Ensure stdout encodes correctly
 sys.stdout.reconfigure(encoding='utf-8')
@@ -28,74 +43,374 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Job Store (In-Memory)
-jobs: Dict[str, Dict[str, Any]] = {}
+# zstd/gzip-encode responses for clients that accept it (reports, /status results)
+app.add_middleware(CompressionMiddleware, minimum_size=RESPONSE_COMPRESSION_MIN_BYTES)
+
+# Job Store (In-Memory): fixed-schema records with bounded retention; results
+# live in the report archive (see jobs.py)
+jobs = JobStore()
+
+# With JOB_BROKER_URL set, jobs are enqueued for worker.py processes and this
+# API holds no crews; otherwise they run here on a pool of pre-built crews,
+# dispatched by priority class and client (one running job per crew)
+broker = connect_broker(JOB_BROKER_URL) if JOB_BROKER_URL else None
+crew_pool = CrewPool() if broker is None else None
+scheduler = Scheduler(crew_pool.size) if broker is None else None
+
+# Scheduled watchlist cache warm-up (PREFETCH_ENABLED=true)
+prefetcher = Prefetcher()
+
+@app.on_event("startup")
+def start_prefetcher():
+    if PREFETCH_ENABLED:
+        prefetcher.start()
+
+@app.on_event("shutdown")
+def stop_prefetcher():
+    prefetcher.stop()
+    compute_pool.get_pool().shutdown()
 
 class AnalysisRequest(BaseModel):
     symbol: str
+    # Seconds before the job is cancelled; defaults to JOB_DEADLINE_SECONDS (0 = none)
+    deadline_seconds: Optional[float] = None
+    # Batch jobs only get the crews interactive ones leave over (see scheduler.py)
+    priority: Literal["interactive", "batch"] = "interactive"
+    # Jobs are queued fairly per client; defaults to X-Client-Id or the caller's IP
+    client_id: Optional[str] = None
+
+class BatchAnalysisRequest(BaseModel):
+    symbols: List[str]
+    deadline_seconds: Optional[float] = None
+    priority: Literal["interactive", "batch"] = "batch"
+    client_id: Optional[str] = None
+
+def _record_job_metrics(status: str, timings: Dict[str, Any]):
+    metrics.JOBS_TOTAL.inc(status=status)
+    metrics.JOB_SECONDS.observe(timings["wall_ms"] / 1000, status=status)
+    for stage, stats in timings["categories"].items():
+        metrics.STAGE_SECONDS.observe(stats["duration_ms"] / 1000, stage=stage)
+
+def _deadline(request: AnalysisRequest) -> Optional[float]:
+    seconds = request.deadline_seconds if request.deadline_seconds is not None else JOB_DEADLINE_SECONDS
+    return seconds if seconds and seconds > 0 else None
+
+def _client_id(request, http_request: Request) -> str:
+    if request.client_id:
+        return request.client_id
+    header = http_request.headers.get("x-client-id")
+    if header:
+        return header
+    return http_request.client.host if http_request.client else "anonymous"
+
+def _record_cancelled(task_id: str, symbol: str, error: JobCancelled, partial: list):
+    print(f"[{task_id}] {error} after {len(partial)} task(s)")
+    try:
+        report_filename = save_partial_report(symbol, partial, error.reason)
+    except Exception as e:
+        # The job still ends as cancelled, just without a partial report
+        print(f"[{task_id}] Could not save partial report: {e}")
+        report_filename = None
+    timings = jobs[task_id].trace.summary()
+    jobs.finish(
+        task_id, "cancelled",
+        cancel_reason=error.reason,
+        error=str(error),
+        report_file=report_filename,
+        report_id=report_id(report_filename) if report_filename else None,
+        timings=timings,
+    )
+    _record_job_metrics("cancelled", timings)
+
+def cancel_queued_task(task_id: str, symbol: str, reason: str):
+    """Scheduler callback for a job cancelled (or past its deadline) before it got a crew."""
+    metrics.JOBS_QUEUED.dec()
+    _record_cancelled(task_id, symbol, JobCancelled(reason), [])
 
 def run_analysis_task(task_id: str, symbol: str):
     """
     Background worker to run the financial crew.
+    Called by the scheduler once a crew is free for this job.
     """
-    print(f"[{task_id}] Starting analysis for {symbol}")
-    jobs[task_id]["status"] = "running"
+    job = jobs[task_id]
+    trace, token, priority = job.trace, job.token, job.priority
+    partial = []
+    trace.add_span("wait for crew", "queue", trace.started, time.perf_counter(), priority=priority)
+    metrics.JOBS_QUEUED.dec()
+    metrics.JOBS_RUNNING.inc()
+    if priority == "batch":
+        # Batch jobs expect to queue; their deadline only bounds the run itself
+        token.set_deadline(job.deadline_seconds)
     
     try:
-        # Create and run crew
-        crew = create_financial_crew(symbol.upper())
-        inputs = {
-            "stock_symbol": symbol.upper(),
-            "analysis_date": datetime.now().strftime("%Y-%m-%d"),
-        }
-        
-        # This blocks until completion
-        result = crew.kickoff(inputs=inputs)
+        with activate(trace), activate_token(token):
+            token.check()
+            with crew_pool.checkout() as crew:
+                try:
+                    print(f"[{task_id}] Starting analysis for {symbol}")
+                    job.status = "running"
+                    inputs = {
+                        "stock_symbol": symbol.upper(),
+                        "analysis_date": datetime.now().strftime("%Y-%m-%d"),
+                    }
+                    
+                    # This blocks until completion (or cancellation at the next step)
+                    with span("kickoff", "crew", symbol=symbol.upper()):
+                        result = crew.kickoff(inputs=inputs)
+                except JobCancelled:
+                    partial = finished_task_outputs(crew)
+                    raise
+                finally:
+                    job.agents = agent_loop_stats(crew)
+                    for role, stats in job.agents.items():
+                        metrics.AGENT_ITERATIONS.observe(stats["iterations"], agent=role)
         
         # Save to file (as per original main.py logic)
-        report_filename = os.path.join(
-            REPORTS_DIR,
-            f"{symbol.upper()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        )
-        os.makedirs(REPORTS_DIR, exist_ok=True)
-        
-        with open(report_filename, 'w') as f:
-            json.dump({
-                "symbol": symbol.upper(),
-                "analysis_date": datetime.now().isoformat(),
-                "report": str(result),
-            }, f, indent=2)
+        report_filename = save_report(symbol, result)
             
-        jobs[task_id]["status"] = "completed"
-        jobs[task_id]["result"] = str(result)
-        jobs[task_id]["report_file"] = report_filename
+        # The result text stays in the archive; /status reads it back by report_id
+        jobs.finish(
+            task_id, "completed",
+            report_file=report_filename,
+            report_id=report_id(report_filename),
+            timings=trace.summary(),
+        )
         print(f"[{task_id}] Analysis complete for {symbol}")
+        _record_job_metrics("completed", job.timings)
+        
+    except JobCancelled as e:
+        _record_cancelled(task_id, symbol, e, partial)
         
     except Exception as e:
         print(f"[{task_id}] Error: {e}")
-        jobs[task_id]["status"] = "failed"
-        jobs[task_id]["error"] = str(e)
+        jobs.finish(task_id, "failed", error=str(e), timings=trace.summary())
+        _record_job_metrics("failed", job.timings)
 
-@app.post("/analyze")
-async def analyze(request: AnalysisRequest, background_tasks: BackgroundTasks):
+    finally:
+        metrics.JOBS_RUNNING.dec()
+
+def _submit(symbol: str, request, client: str) -> str:
     task_id = str(uuid.uuid4())
-    jobs[task_id] = {
+    record = {
         "status": "pending",
-        "symbol": request.symbol,
+        "symbol": symbol,
+        "priority": request.priority,
+        "client_id": client,
         "submitted_at": datetime.now().isoformat()
     }
+    deadline = _deadline(request)
+    if deadline is not None:
+        record["deadline_seconds"] = deadline
+    if broker is not None:
+        payload = {"symbol": symbol, "priority": request.priority}
+        if deadline is not None and request.priority == "batch":
+            payload["deadline_seconds"] = deadline  # Counted from when a worker starts it
+        elif deadline is not None:
+            # Wall-clock, so any worker host can enforce it
+            payload["deadline_at"] = time.time() + deadline
+        broker.enqueue(task_id, payload, record)
+        return task_id
+
+    job = JobRecord(
+        task_id, symbol, request.priority, client, record["submitted_at"], deadline,
+        trace=Trace(f"{symbol.upper()} {task_id}"),
+        # Batch deadlines start when the job is dispatched (run_analysis_task)
+        token=CancelToken(deadline if request.priority == "interactive" else None),
+    )
+    jobs.add(job)
+    metrics.JOBS_QUEUED.inc()
     
-    background_tasks.add_task(run_analysis_task, task_id, request.symbol)
-    
+    scheduler.submit(
+        task_id,
+        lambda: run_analysis_task(task_id, symbol),
+        job_class=request.priority,
+        client=client,
+        token=job.token,
+        on_cancel=lambda reason: cancel_queued_task(task_id, symbol, reason),
+    )
+    return task_id
+
+@app.post("/analyze")
+def analyze(request: AnalysisRequest, http_request: Request):
+    task_id = _submit(request.symbol, request, _client_id(request, http_request))
     return {"task_id": task_id, "status": "pending"}
 
+@app.post("/analyze/batch")
+def analyze_batch(request: BatchAnalysisRequest, http_request: Request):
+    """Queue one job per symbol (batch priority by default); returns their task ids in order."""
+    client = _client_id(request, http_request)
+    task_ids = [_submit(symbol, request, client) for symbol in request.symbols]
+    return {"task_ids": task_ids, "status": "pending"}
+
+@app.delete("/jobs/{task_id}")
+def cancel_job(task_id: str):
+    """
+    Cancel a pending or running job. A queued job is dropped; a running one
+    stops at its next LLM step or HTTP call, keeping the tasks it finished.
+    """
+    record = broker.get(task_id) if broker is not None else jobs.get(task_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    status = record["status"] if broker is not None else record.status
+    if status in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Task already {status}")
+
+    if broker is not None:
+        status = broker.cancel(task_id)
+    elif scheduler.cancel(task_id):
+        status = "cancelled"
+    else:
+        token = record.token
+        if token is not None:
+            token.cancel()
+        record.cancel_requested = True
+        status = "cancelling"
+    return {"task_id": task_id, "status": status}
+
 @app.get("/status/{task_id}")
-async def get_status(task_id: str):
-    if task_id not in jobs:
+def get_status(task_id: str):
+    """Job status. A plain def (run in the threadpool): finished jobs read their result from the report archive."""
+    if broker is not None:
+        record = broker.get(task_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return with_result(record)
+
+    job = jobs.get(task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    return jobs[task_id]
+    return job.to_dict()
+
+@app.get("/status/{task_id}/timings")
+def get_timings(task_id: str, format: str = "spans"):
+    """
+    Timing spans for a job (live while it runs).
+    `format=chrome` returns Chrome trace JSON for chrome://tracing / Perfetto.
+    Jobs run by workers, and older finished jobs (jobs.KEEP_TRACES), only
+    report their summary.
+    """
+    if broker is not None:
+        record = broker.get(task_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return {"task_id": task_id, "summary": record.get("timings")}
+
+    job = jobs.get(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    trace = job.trace
+    if trace is None:
+        return {"task_id": task_id, "summary": job.timings}
+    if format == "chrome":
+        return trace.to_chrome_trace()
+    return {
+        "task_id": task_id,
+        "summary": trace.summary(),
+        "spans": list(trace.spans),
+    }
+
+def _parse_time(value: Optional[str], name: str) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date or datetime")
+
+@app.get("/reports")
+def list_reports(symbol: Optional[str] = None, limit: int = 100):
+    """Newest archived reports first (id, symbol, size and codec; contents not read)."""
+    entries = []
+    for rid, path in report_files(symbol=symbol):
+        symbol_part, created = parse_report_id(rid)
+        entries.append({
+            "id": rid,
+            "symbol": symbol_part,
+            "created": created.isoformat(),
+            "encoding": stored_encoding(path),
+            "bytes": os.path.getsize(path),
+        })
+    return entries[::-1][:limit]
+
+@app.get("/reports/export")
+def export_reports(symbol: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                   include_partial: bool = False):
+    """
+    Stream archived reports as NDJSON (one report per line, oldest first).
+    Reports are read one at a time, so the export never holds the archive in memory.
+    """
+    files = report_files(symbol=symbol, since=_parse_time(since, "since"), until=_parse_time(until, "until"))
+
+    def lines():
+        for rid, path in files:
+            try:
+                record = load_report(path)
+            except Exception as e:
+                print(f"[export] Skipping {rid}: {e}")
+                continue
+            if record.get("partial") and not include_partial:
+                continue
+            yield json.dumps({"id": rid, **record}, separators=(",", ":")) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="reports.ndjson"'})
+
+@app.get("/reports/{rid}")
+def get_report(rid: str, request: Request):
+    """
+    One archived report. Sent as stored (no recompression) when the client
+    accepts the archive codec, otherwise decompressed.
+    """
+    path = find_report(rid)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    data, encoding = read_raw(path)
+    if encoding is not None and negotiate(request.headers.get("accept-encoding"), (encoding,)):
+        return Response(data, media_type="application/json",
+                        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    return Response(decompress(data, encoding), media_type="application/json")
+
+@app.get("/screen")
+def screen(symbols: str, resolution: str = "D", bars: int = 400):
+    """
+    Moving averages, RSI and support/resistance for many symbols at once
+    (comma-separated), computed on the shared-memory process pool
+    (tools/compute_pool.py). `bars` is days of daily history or intraday bars.
+    """
+    wanted = [s.strip().upper() for s in symbols.split(",") if s.strip()]
+    if not wanted:
+        raise HTTPException(status_code=400, detail="symbols is required")
+    try:
+        results = compute_pool.screen(wanted, bars, resolution=resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "resolution": resolution,
+        "symbols": results,
+        "missing": [s for s in wanted if s not in results],
+    }
 
 @app.get("/health")
-async def health():
-    return {"status": "ok"}
+def health():
+    memory = metrics.process_memory()
+    if broker is not None:
+        return {"status": "ok", "broker": broker.stats(), "workers": broker.workers(), "memory": memory}
+    return {"status": "ok", "scheduler": scheduler.stats(), "jobs": jobs.stats(), "memory": memory}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition of in-process counters and histograms."""
+    if broker is not None:
+        stats = broker.stats()
+        metrics.JOBS_QUEUED.set(stats["queued"])
+        metrics.JOBS_RUNNING.set(stats["running"])
+    else:
+        metrics.CREW_POOL_AVAILABLE.set(crew_pool.available)
+        by_status = jobs.stats()["by_status"]
+        # Every status each scrape, so one that drops to zero doesn't keep its last count
+        for status in ("pending", "running") + FINISHED_STATUSES:
+            metrics.JOBS_RETAINED.set(by_status.get(status, 0), status=status)
+    metrics.PROCESS_RESIDENT_BYTES.set(metrics.process_memory()["rss_bytes"] or 0)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,438 @@
+# backtest.py
+"""
+Backtest the crew's archived recommendations and the technical rules its
+analysts use, over cached daily history.
+
+All symbols are packed end to end into flat arrays (see tools/indicators.py),
+so signals, positions and P&L are computed for every symbol and bar at once
+with NumPy; the only Python loop is over archived reports.
+
+    python backtest.py                        # all cached symbols + data/reports
+    python backtest.py --symbols AAPL,NVDA --cost-bps 5 --output backtest.json
+"""
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+import argparse
+import glob
+import json
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import CACHE_DIR, REPORTS_DIR
+from reports import report_files, load_report
+from tools import indicators
+
+TRADING_DAYS = 252
+# Forward windows (trading days) used to score report recommendations
+HORIZONS = (5, 21, 63)
+# A HOLD counts as a hit if the stock moved less than this either way
+HOLD_BAND = 0.05
+
+# ============= REPORT PARSING =============
+
+_REC = r"(BUY|SELL|HOLD)"
+_RECOMMENDATION_PATTERNS = [
+    re.compile(r'"recommendation"\s*:\s*"\s*' + _REC, re.I),
+    re.compile(r"RECOMMENDATION\**\s*[:\-]\s*\**\s*" + _REC, re.I),
+    re.compile(r"\[\s*" + _REC + r"\s*\]", re.I),
+    # Last resort: the bare word, upper-case only, so prose like "holding" or "buy" is not a call
+    re.compile(r"\b" + _REC + r"\b"),
+]
+_TARGET_PATTERNS = [
+    re.compile(r'"price_target"\s*:\s*"\s*\$?\s*([\d,]+(?:\.\d+)?)', re.I),
+    re.compile(r"price target[^$\d\n]{0,25}\$?\s*([\d,]+(?:\.\d+)?)", re.I),
+]
+_CONFIDENCE_PATTERNS = [
+    re.compile(r'"confidence"\s*:\s*"\s*(\d{1,3}(?:\.\d+)?)', re.I),
+    re.compile(r"confidence[^\d\n]{0,25}(\d{1,3}(?:\.\d+)?)\s*%", re.I),
+]
+
+def _first_match(patterns, text):
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+def parse_report(text: str) -> dict:
+    """
+    Pull recommendation (BUY/SELL/HOLD), price target and confidence (0-1)
+    out of a report. Reports are free text from the LLM, so fields that
+    can't be found are None.
+    """
+    recommendation = _first_match(_RECOMMENDATION_PATTERNS, text)
+    target = _first_match(_TARGET_PATTERNS, text)
+    confidence = _first_match(_CONFIDENCE_PATTERNS, text)
+    return {
+        "recommendation": recommendation.upper() if recommendation else None,
+        "price_target": float(target.replace(",", "")) if target else None,
+        "confidence": float(confidence) / 100 if confidence else None,
+    }
+
+def load_reports(reports_dir: str = REPORTS_DIR) -> list:
+    """Archived reports (see reports.py) with their parsed recommendation."""
+    reports = []
+    for rid, path in report_files(reports_dir):
+        try:
+            data = load_report(path)
+            date = datetime.fromisoformat(data["analysis_date"])
+        except Exception as e:
+            print(f"[backtest] Skipping {path}: {e}")
+            continue
+        if data.get("partial"):
+            continue  # Cut-off job without a final recommendation
+        entry = {"file": rid, "symbol": data["symbol"].upper(), "date": date}
+        entry.update(parse_report(str(data.get("report", ""))))
+        reports.append(entry)
+    return reports
+
+# ============= PRICE PANEL =============
+
+def load_history(symbol: str):
+    """
+    Daily bars for `symbol` from the cache only (Finnhub candles and
+    Alpha Vantage daily, merged; Finnhub wins on overlapping dates).
+    """
+    from tools.financial_tools import _read_cache
+
+    frames = []
+    data_types = ["av_history_daily"] + sorted(
+        os.path.basename(p)[len(symbol) + 1:-4]
+        for p in glob.glob(os.path.join(CACHE_DIR, f"{symbol}_history_finnhub_D*.pkl"))
+    )
+    for data_type in data_types:
+        df, _, _ = _read_cache(symbol, data_type)
+        if df is not None and not df.empty:
+            df = df[["Open", "High", "Low", "Close"]].copy()
+            df.index = pd.DatetimeIndex(df.index).normalize()
+            frames.append(df)
+    if not frames:
+        return None
+    merged = pd.concat(frames)
+    return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+def cached_symbols() -> list:
+    """Symbols with any cached daily history."""
+    symbols = set()
+    for pattern in ("*_av_history_daily.pkl", "*_history_finnhub_D*.pkl"):
+        for path in glob.glob(os.path.join(CACHE_DIR, pattern)):
+            symbols.add(os.path.basename(path).split("_", 1)[0])
+    return sorted(symbols)
+
+class Panel:
+    """Daily bars for many symbols, packed end to end with per-symbol `offsets`."""
+
+    def __init__(self, histories: dict, start=None, end=None):
+        items = []
+        for symbol, hist in histories.items():
+            if hist is None:
+                continue
+            if start is not None:
+                hist = hist[hist.index >= pd.Timestamp(start)]
+            if end is not None:
+                hist = hist[hist.index <= pd.Timestamp(end)]
+            if len(hist) >= 2:
+                items.append((symbol, hist))
+        self.symbols = [s for s, _ in items]
+        lengths = [len(h) for _, h in items]
+        self.offsets = np.zeros(len(items) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+
+        def column(name):
+            if not items:
+                return np.empty(0)
+            return np.concatenate([h[name].to_numpy(dtype=np.float64) for _, h in items])
+
+        self.close = column("Close")
+        self.high = column("High")
+        self.low = column("Low")
+        self.dates = (
+            np.concatenate([h.index.values.astype("datetime64[D]") for _, h in items])
+            if items else np.empty(0, dtype="datetime64[D]")
+        )
+
+    def segment(self, symbol):
+        """(start, end) bar range of `symbol`, or None."""
+        if symbol not in self.symbols:
+            return None
+        i = self.symbols.index(symbol)
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def locate(self, symbol, date):
+        """Index of the first bar of `symbol` on or after `date`, or None."""
+        bounds = self.segment(symbol)
+        if bounds is None:
+            return None
+        start, end = bounds
+        i = start + int(np.searchsorted(self.dates[start:end], np.datetime64(date, "D")))
+        return i if i < end else None
+
+# ============= TECHNICAL RULES =============
+
+def _hold_between(enter, exit, offsets):
+    """
+    Long from each `enter` bar until the next `exit` bar (exit wins on a tie),
+    per symbol; vectorized forward fill of the last event.
+    """
+    state = np.full(len(enter), np.nan)
+    state[enter] = 1.0
+    state[exit] = 0.0
+    first = offsets[:-1]
+    state[first] = np.where(np.isnan(state[first]), 0.0, state[first])
+    last_event = np.where(~np.isnan(state), np.arange(len(state)), 0)
+    np.maximum.accumulate(last_event, out=last_event)
+    return state[last_event]
+
+def rule_buy_and_hold(p: Panel):
+    return np.ones(len(p.close))
+
+def rule_ma20_50_cross(p: Panel):
+    """Long while the 20-day MA is above the 50-day MA."""
+    ma20 = indicators.rolling_mean(p.close, p.offsets, 20)
+    ma50 = indicators.rolling_mean(p.close, p.offsets, 50)
+    return (ma20 > ma50).astype(np.float64)
+
+def rule_ma200_trend(p: Panel):
+    """Long while price is above the 200-day MA."""
+    ma200 = indicators.rolling_mean(p.close, p.offsets, 200)
+    return (p.close > ma200).astype(np.float64)
+
+def rule_rsi_30_70(p: Panel):
+    """Buy when RSI(14) drops below 30, sell when it rises above 70."""
+    rsi = indicators.rolling_rsi(p.close, p.offsets, 14)
+    return _hold_between(rsi < 30, rsi > 70, p.offsets)
+
+def rule_sr_breakout_90(p: Panel):
+    """Buy on a close above the prior 90-day high, sell on a close below the prior 90-day low."""
+    resistance = indicators.shift(indicators.rolling_max(p.high, p.offsets, 90), p.offsets)
+    support = indicators.shift(indicators.rolling_min(p.low, p.offsets, 90), p.offsets)
+    return _hold_between(p.close > resistance, p.close < support, p.offsets)
+
+RULES = {
+    "buy_and_hold": rule_buy_and_hold,
+    "ma20_50_cross": rule_ma20_50_cross,
+    "ma200_trend": rule_ma200_trend,
+    "rsi_30_70": rule_rsi_30_70,
+    "sr_breakout_90": rule_sr_breakout_90,
+}
+
+def _round(value, digits=4):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+def evaluate_positions(p: Panel, positions, cost_bps: float = 0.0) -> dict:
+    """
+    P&L of `positions` (decided at each bar's close, applied to the next
+    bar's return), with `cost_bps` charged on every change of position.
+    """
+    offsets = p.offsets
+    # Panel keeps only symbols with bars, so every segment is non-empty
+    starts, ends = offsets[:-1], offsets[1:]
+    segment, _ = indicators.bar_positions(offsets)
+
+    returns = np.nan_to_num(p.close / indicators.shift(p.close, offsets) - 1)
+    held = indicators.shift(positions, offsets, fill=0.0)
+    turnover = np.abs(held - indicators.shift(held, offsets, fill=0.0))
+    strategy = held * returns - turnover * cost_bps / 10_000
+    log_ret = np.log1p(strategy)
+
+    # Per-symbol compounded return
+    total_log = np.add.reduceat(log_ret, starts)
+    total_return = np.expm1(total_log)
+    years = (ends - starts) / TRADING_DAYS
+    annualized = np.expm1(total_log / years)
+
+    # Drawdown: running peak of the log-equity curve, reset per symbol by
+    # lifting each symbol above every earlier one before the accumulate
+    csum = np.cumsum(log_ret)
+    equity = csum - np.concatenate(([0.0], csum))[starts][segment]
+    lift = (np.ptp(equity) + 1) * segment if len(equity) else 0
+    peak = np.maximum(np.maximum.accumulate(equity + lift) - lift, 0.0)
+    drawdown = np.expm1(equity - peak)
+    max_drawdown = np.minimum.reduceat(drawdown, starts)
+
+    # Trades: consecutive bars in position, numbered across all symbols
+    in_position = held != 0
+    entries = in_position & (indicators.shift(held, offsets, fill=0.0) == 0)
+    trade_id = np.cumsum(entries) - 1
+    trade_returns = np.expm1(np.bincount(trade_id[in_position], weights=log_ret[in_position], minlength=int(entries.sum())))
+    trades_per_symbol = np.add.reduceat(entries.astype(np.int64), starts)
+
+    return {
+        "symbols": len(p.symbols),
+        "bars": int(len(p.close)),
+        "exposure": _round(in_position.mean()),
+        "trades": int(len(trade_returns)),
+        "hit_rate": _round((trade_returns > 0).mean()) if len(trade_returns) else None,
+        "avg_trade_return": _round(trade_returns.mean()) if len(trade_returns) else None,
+        "mean_total_return": _round(total_return.mean()),
+        "mean_annualized_return": _round(annualized.mean()),
+        "mean_max_drawdown": _round(max_drawdown.mean()),
+        "worst_max_drawdown": _round(max_drawdown.min()),
+        "per_symbol": {
+            symbol: {
+                "total_return": _round(total_return[i]),
+                "max_drawdown": _round(max_drawdown[i]),
+                "trades": int(trades_per_symbol[i]),
+            }
+            for i, symbol in enumerate(p.symbols)
+        },
+    }
+
+def backtest_rules(p: Panel, rules=None, cost_bps: float = 0.0) -> dict:
+    rules = rules or list(RULES)
+    return {name: evaluate_positions(p, RULES[name](p), cost_bps) for name in rules}
+
+# ============= REPORT RECOMMENDATIONS =============
+
+_DIRECTION = {"BUY": 1, "SELL": -1, "HOLD": 0}
+
+def backtest_reports(p: Panel, reports: list, horizons=HORIZONS) -> dict:
+    """
+    Score each parsed report against what the stock did next: entry at the
+    first close on or after the report date, exit `h` trading days later.
+    Reports without enough subsequent bars are counted as pending.
+    """
+    rows = []
+    for r in reports:
+        if r["recommendation"] not in _DIRECTION:
+            continue
+        i = p.locate(r["symbol"], r["date"])
+        if i is None:
+            continue
+        end = p.segment(r["symbol"])[1]
+        rows.append((i, end, _DIRECTION[r["recommendation"]], r["price_target"] or np.nan, r["confidence"] or np.nan))
+
+    summary = {
+        "reports": len(reports),
+        "parsed": sum(1 for r in reports if r["recommendation"] in _DIRECTION),
+        "matched": len(rows),
+        "rules": {},
+    }
+    if not rows:
+        return summary
+
+    entry, seg_end, direction, target, confidence = (np.array(col) for col in zip(*rows))
+    entry_price = p.close[entry]
+
+    for name, d in (("report_buy", 1), ("report_sell", -1), ("report_hold", 0)):
+        mask = direction == d
+        rule = {
+            "count": int(mask.sum()),
+            "mean_confidence": _round(np.nanmean(confidence[mask])) if np.any(~np.isnan(confidence[mask])) else None,
+            "horizons": {},
+        }
+        for h in horizons:
+            ok = mask & (entry + h < seg_end)
+            result = {"evaluated": int(ok.sum()), "pending": int((mask & ~ok).sum())}
+            if ok.any():
+                e, ep = entry[ok], entry_price[ok]
+                fwd = p.close[e + h] / ep - 1
+                # Bars inside each holding window, as an (n, h) index matrix
+                window = e[:, None] + np.arange(1, h + 1)
+                highest, lowest = p.high[window].max(axis=1), p.low[window].min(axis=1)
+                if d == 0:
+                    hits = np.abs(fwd) <= HOLD_BAND
+                    adverse = -np.maximum(highest / ep - 1, 1 - lowest / ep)
+                else:
+                    hits = d * fwd > 0
+                    adverse = lowest / ep - 1 if d > 0 else 1 - highest / ep
+                t = target[ok]
+                has_target = ~np.isnan(t)
+                reached = (highest >= t) if d > 0 else (lowest <= t)
+                result.update({
+                    "hit_rate": _round(hits.mean()),
+                    "mean_return": _round((d or 1) * fwd.mean()),
+                    "median_return": _round((d or 1) * np.median(fwd)),
+                    "target_hit_rate": _round(reached[has_target].mean()) if d and has_target.any() else None,
+                    "mean_drawdown": _round(np.minimum(adverse, 0).mean()),
+                    "worst_drawdown": _round(np.minimum(adverse, 0).min()),
+                })
+            rule["horizons"][str(h)] = result
+        summary["rules"][name] = rule
+    return summary
+
+# ============= ENTRY POINT =============
+
+def run(symbols=None, reports_dir: str = REPORTS_DIR, start=None, end=None,
+        cost_bps: float = 0.0, fetch: bool = False, rules=None) -> dict:
+    """Backtest technical rules and archived reports over cached history."""
+    reports = load_reports(reports_dir)
+    if symbols is None:
+        symbols = sorted(set(cached_symbols()) | {r["symbol"] for r in reports})
+    symbols = [s.upper() for s in symbols]
+
+    if fetch:
+        # Refresh the cache through the normal (rate-limited) fetchers first
+        from tools.financial_tools import _get_hybrid_history
+        for symbol in symbols:
+            _get_hybrid_history(symbol, 400)
+
+    panel = Panel({s: load_history(s) for s in symbols}, start=start, end=end)
+    missing = sorted(set(symbols) - set(panel.symbols))
+    if missing:
+        print(f"[backtest] No cached history for: {', '.join(missing)}")
+
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "symbols": panel.symbols,
+        "period": {
+            "start": str(panel.dates.min()) if len(panel.dates) else None,
+            "end": str(panel.dates.max()) if len(panel.dates) else None,
+        },
+        "cost_bps": cost_bps,
+        "rules": backtest_rules(panel, rules, cost_bps) if panel.symbols else {},
+        "reports": backtest_reports(panel, [r for r in reports if r["symbol"] in symbols]),
+    }
+
+def _print_summary(result: dict):
+    print(f"\n📈 Backtest {result['period']['start']} → {result['period']['end']} "
+          f"({len(result['symbols'])} symbols, cost {result['cost_bps']} bps)\n")
+    print(f"{'rule':<16} {'trades':>7} {'hit':>7} {'avg trade':>10} {'return':>9} {'ann.':>8} {'max DD':>8} {'exposure':>9}")
+    fmt = lambda v: "-" if v is None else f"{v:.1%}"
+    for name, r in result["rules"].items():
+        print(f"{name:<16} {r['trades']:>7} {fmt(r['hit_rate']):>7} {fmt(r['avg_trade_return']):>10} "
+              f"{fmt(r['mean_total_return']):>9} {fmt(r['mean_annualized_return']):>8} "
+              f"{fmt(r['worst_max_drawdown']):>8} {fmt(r['exposure']):>9}")
+
+    reports = result["reports"]
+    print(f"\n🗂️ Reports: {reports['reports']} archived, {reports['parsed']} parsed, {reports['matched']} with history")
+    for name, r in reports["rules"].items():
+        for h, s in r["horizons"].items():
+            line = f"{name:<12} {h:>3}d  n={s['evaluated']:<4} pending={s['pending']:<4}"
+            if s["evaluated"]:
+                line += (f" hit={fmt(s['hit_rate'])} ret={fmt(s['mean_return'])} "
+                         f"target={fmt(s['target_hit_rate'])} worst DD={fmt(s['worst_drawdown'])}")
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest recommendations and technical rules on cached history")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: everything cached or reported)")
+    parser.add_argument("--reports-dir", default=REPORTS_DIR, help="Archived reports to score")
+    parser.add_argument("--start", help="First date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last date (YYYY-MM-DD)")
+    parser.add_argument("--rules", help=f"Comma-separated rules (default: all of {', '.join(RULES)})")
+    parser.add_argument("--cost-bps", type=float, default=0.0, help="Cost per position change, in basis points")
+    parser.add_argument("--fetch", action="store_true", help="Refresh cached history from the providers first")
+    parser.add_argument("--output", help="Write full results (including per-symbol stats) as JSON")
+    args = parser.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else None
+    rules = [r.strip() for r in args.rules.split(",")] if args.rules else None
+    unknown = set(rules or []) - set(RULES)
+    if unknown:
+        print(f"❌ Unknown rules: {', '.join(sorted(unknown))}")
+        sys.exit(1)
+
+    result = run(symbols, args.reports_dir, args.start, args.end, args.cost_bps, args.fetch, rules)
+    _print_summary(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n📁 Results saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
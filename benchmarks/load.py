@@ -0,0 +1,366 @@
+# benchmarks/load.py
+"""
+Load test for the FastAPI service.
+
+Starts api.py in a child process (so the load generator doesn't share its
+GIL) with either a stub crew, whose tasks just take the configured stage
+latencies, or the real crew against the stand-in providers and stub LLM.
+Each concurrency level runs that many closed-loop clients for `--duration`
+seconds: submit `/analyze`, poll `/status` until the job finishes, repeat.
+A prober calls `/health` meanwhile. Reported per level: job throughput,
+end-to-end and queue-wait percentiles (per priority class), latency of each
+endpoint and the server's event-loop lag.
+
+    python -m benchmarks.load --concurrency 1,4,8,16 --crews 4
+    python -m benchmarks.load --stages research=4,technical=2,fundamental=2,portfolio=3 --batch-fraction 0.5
+    python -m benchmarks.load --crew real --llm-latency 0.5 --api-latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmarks.providers import FakeProviderServer, FixtureStore
+from benchmarks.run import _configure_environment, _free_port, _git_commit, _install_stub_llm, _percentile
+
+# Stub crew stages: (name, agent role, default seconds)
+STAGES = (
+    ("research", "Market Research Analyst", 2.0),
+    ("technical", "Technical Analysis Expert", 1.5),
+    ("fundamental", "Fundamental Analysis Specialist", 1.5),
+    ("portfolio", "Senior Portfolio Manager", 1.0),
+)
+
+# Seconds between event-loop lag samples in the server
+LAG_INTERVAL = 0.05
+
+FINISHED = ("completed", "failed", "cancelled")
+
+# Consecutive failed /status polls (404 after eviction, server gone) before a job is given up
+MAX_POLL_ERRORS = 20
+
+# ============= SERVER (child process) =============
+
+class StubCrew:
+    """Stands in for a crew: each task sleeps its stage latency (cancellable), recording a task span."""
+
+    def __init__(self, stages, jitter: float, rng: random.Random):
+        self.stages = stages
+        self.jitter = jitter
+        self.rng = rng
+        self.agents = []
+        self.tasks = [SimpleNamespace(name=name, agent=SimpleNamespace(role=role), output=None)
+                      for name, role, _ in stages]
+
+    def kickoff(self, inputs):
+        from cancellation import current_token
+        from profiling import span
+
+        symbol = inputs["stock_symbol"]
+        token = current_token()
+        for task, (name, role, seconds) in zip(self.tasks, self.stages):
+            seconds *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+            with span(name, "task", agent=role):
+                if token is not None:
+                    token.sleep(seconds)
+                else:
+                    time.sleep(seconds)
+            task.output = SimpleNamespace(raw=f"Stub {name} output for {symbol}.")
+        return (f"Stub analysis for {symbol}.\n## RECOMMENDATION: HOLD\n"
+                "**Price Target:** N/A\n**Confidence Level:** 50%")
+
+def _stub_pool(size: int, stages, jitter: float):
+    from crew import CrewPool
+
+    class StubCrewPool(CrewPool):
+        def __init__(self):
+            import queue
+            self.size = size
+            self._crews = queue.Queue()
+            for i in range(size):
+                self._crews.put(StubCrew(stages, jitter, random.Random(i)))
+
+        def release(self, crew):
+            for task in crew.tasks:
+                task.output = None
+            self._crews.put(crew)
+
+    return StubCrewPool()
+
+def _serve(conn, port: int, options: dict):
+    """Child process: run the API until told to stop, answering lag/memory requests over `conn`."""
+    import uvicorn
+
+    provider = FakeProviderServer(FixtureStore(), latency=options["api_latency"]).start()
+    _configure_environment(provider, options["data_dir"], options["crews"])
+    if options["crew"] == "real":
+        _install_stub_llm(options["llm_latency"], FixtureStore().symbols)
+
+    import api
+    import metrics
+    if options["crew"] == "stub":
+        api.crew_pool = _stub_pool(options["crews"], options["stages"], options["jitter"])
+
+    lag = {"samples": []}
+
+    async def probe_lag():
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            lag["samples"].append((loop.time() - start - LAG_INTERVAL) * 1000)
+
+    async def start_probe():
+        lag["task"] = asyncio.get_running_loop().create_task(probe_lag())
+
+    api.app.router.on_startup.append(start_probe)
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    conn.send("ready")
+
+    while True:
+        command = conn.recv()
+        samples, lag["samples"] = lag["samples"], []
+        conn.send({"lag_ms": samples, "memory": metrics.process_memory()})
+        if command == "stop":
+            break
+    server.should_exit = True
+    thread.join(timeout=10)
+    provider.stop()
+
+# ============= LOAD GENERATOR =============
+
+class Recorder:
+    """Thread-safe sample lists keyed by name."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, value):
+        with self._lock:
+            self.samples.setdefault(name, []).append(value)
+
+    def error(self, name: str):
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+def _summary(values, scale: float = 1.0, digits: int = 3) -> dict:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50": round(_percentile(values, 50) * scale, digits),
+        "p95": round(_percentile(values, 95) * scale, digits),
+        "p99": round(_percentile(values, 99) * scale, digits),
+        "max": round(max(values) * scale, digits),
+    }
+
+def _timed(session, recorder: Recorder, name: str, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = session.request(method, url, timeout=30, **kwargs)
+        response.raise_for_status()
+    except Exception:
+        recorder.error(name)
+        return None
+    recorder.add(name, (time.perf_counter() - start) * 1000)
+    return response.json()
+
+def _client(base: str, symbols, stop_at: float, args, recorder: Recorder, rng: random.Random):
+    import requests
+
+    session = requests.Session()
+    while time.monotonic() < stop_at:
+        priority = "batch" if rng.random() < args.batch_fraction else "interactive"
+        body = {"symbol": rng.choice(symbols), "priority": priority}
+        start = time.perf_counter()
+        submitted = _timed(session, recorder, "/analyze", "POST", f"{base}/analyze", json=body)
+        if submitted is None:
+            time.sleep(args.poll_interval)
+            continue
+        give_up_at = time.monotonic() + args.job_timeout
+        errors = 0
+        while True:
+            time.sleep(args.poll_interval)
+            status = _timed(session, recorder, "/status", "GET", f"{base}/status/{submitted['task_id']}")
+            if status is not None and status["status"] in FINISHED:
+                break
+            errors = errors + 1 if status is None else 0
+            if errors >= MAX_POLL_ERRORS or time.monotonic() > give_up_at:
+                status = None
+                break
+        if status is None:
+            # Counted as failed; `abandoned` tells these apart from jobs the API failed
+            recorder.add("job:failed", 1)
+            recorder.add("job:abandoned", 1)
+            continue
+        recorder.add(f"job:{status['status']}", 1)
+        recorder.add(f"latency:{priority}", time.perf_counter() - start)
+        queue = (status.get("timings") or {}).get("categories", {}).get("queue")
+        if queue:
+            recorder.add(f"queue:{priority}", queue["duration_ms"] / 1000)
+
+def _health_prober(base: str, stop: threading.Event, interval: float, recorder: Recorder):
+    import requests
+
+    session = requests.Session()
+    while not stop.wait(interval):
+        _timed(session, recorder, "/health", "GET", f"{base}/health")
+
+def run_level(base: str, conn, symbols, concurrency: int, args) -> dict:
+    """Run `concurrency` closed-loop clients for `args.duration` seconds; waits for their last jobs."""
+    recorder = Recorder()
+    stop = threading.Event()
+    prober = threading.Thread(target=_health_prober, args=(base, stop, args.health_interval, recorder), daemon=True)
+    conn.send("lag")
+    conn.recv()  # Discard lag from before this level
+    start = time.perf_counter()
+    stop_at = time.monotonic() + args.duration
+    clients = [
+        threading.Thread(target=_client, args=(base, symbols, stop_at, args, recorder, random.Random(i)), daemon=True)
+        for i in range(concurrency)
+    ]
+    prober.start()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    wall = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    conn.send("lag")
+    server = conn.recv()
+
+    samples = recorder.samples
+    finished = {status: len(samples.get(f"job:{status}", [])) for status in FINISHED}
+    result = {
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "jobs": {**finished, "abandoned": len(samples.get("job:abandoned", []))},
+        "throughput_jobs_per_s": round(finished["completed"] / wall, 3),
+        "latency_s": {},
+        "queue_wait_s": {},
+        "endpoints_ms": {
+            name: {**_summary(samples.get(name, [])), "errors": recorder.errors.get(name, 0)}
+            for name in ("/analyze", "/status", "/health")
+        },
+        "event_loop_lag_ms": _summary(server["lag_ms"]),
+        "server_memory": server["memory"],
+    }
+    for priority in ("interactive", "batch"):
+        if f"latency:{priority}" in samples:
+            result["latency_s"][priority] = _summary(samples[f"latency:{priority}"])
+            result["queue_wait_s"][priority] = _summary(samples.get(f"queue:{priority}", []))
+    return result
+
+def _print_level(result: dict):
+    jobs = result["jobs"]
+    print(f"\n== {result['concurrency']} concurrent clients, {result['wall_s']:.1f}s: "
+          f"{jobs['completed']} completed, {jobs['failed']} failed ({jobs['abandoned']} abandoned), "
+          f"{jobs['cancelled']} cancelled "
+          f"-> {result['throughput_jobs_per_s']:.2f} jobs/s")
+    for priority, latency in result["latency_s"].items():
+        wait = result["queue_wait_s"][priority]
+        print(f"   {priority:<11} job p50/p95/p99 {latency['p50']:.2f}/{latency['p95']:.2f}/{latency['p99']:.2f}s"
+              f"   queue wait p50/p95 {wait.get('p50', 0):.2f}/{wait.get('p95', 0):.2f}s")
+    for name, stats in result["endpoints_ms"].items():
+        if stats["count"]:
+            print(f"   {name:<11} p50/p95/p99 {stats['p50']:.1f}/{stats['p95']:.1f}/{stats['p99']:.1f}ms"
+                  f"   ({stats['count']} calls, {stats['errors']} errors)")
+    lag = result["event_loop_lag_ms"]
+    if lag["count"]:
+        print(f"   event loop  lag p50/p99/max {lag['p50']:.1f}/{lag['p99']:.1f}/{lag['max']:.1f}ms")
+
+def _print_capacity(results: list):
+    """One line per level: where throughput stops growing and latency starts to climb."""
+    print(f"\n{'clients':>7} {'jobs/s':>7} {'job p95 s':>10} {'queue p95 s':>12} {'/status p99 ms':>15} {'loop lag p99 ms':>16}")
+    for result in results:
+        latency = [v for s in result["latency_s"].values() for v in (s.get("p95"),) if v is not None]
+        wait = [v for s in result["queue_wait_s"].values() for v in (s.get("p95"),) if v is not None]
+        status = result["endpoints_ms"]["/status"].get("p99", 0)
+        lag = result["event_loop_lag_ms"].get("p99", 0)
+        print(f"{result['concurrency']:>7} {result['throughput_jobs_per_s']:>7.2f} {max(latency, default=0):>10.2f} "
+              f"{max(wait, default=0):>12.2f} {status:>15.1f} {lag:>16.1f}")
+
+def _parse_stages(value: str):
+    seconds = {name: default for name, _, default in STAGES}
+    for part in filter(None, (p.strip() for p in (value or "").split(","))):
+        name, _, latency = part.partition("=")
+        if name not in seconds:
+            raise SystemExit(f"Unknown stage {name!r} (stages: {', '.join(seconds)})")
+        seconds[name] = float(latency)
+    return [(name, role, seconds[name]) for name, role, _ in STAGES]
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /analyze, /status and /health against a stubbed crew")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated client counts, one level each")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds each level keeps submitting jobs")
+    parser.add_argument("--crews", type=int, default=2, help="Crew pool size (CREW_POOL_SIZE) of the server")
+    parser.add_argument("--crew", choices=("stub", "real"), default="stub",
+                        help="stub: tasks sleep --stages; real: CrewAI with the stub LLM and stand-in providers")
+    parser.add_argument("--stages", help="Stub stage seconds, e.g. research=2,technical=1.5,fundamental=1.5,portfolio=1")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Random +/- fraction applied to stub stage latencies")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per stub LLM call (--crew real)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Seconds added to each provider response (--crew real)")
+    parser.add_argument("--batch-fraction", type=float, default=0.0, help="Share of jobs submitted with batch priority")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="Seconds between /status polls per client")
+    parser.add_argument("--job-timeout", type=float, default=600,
+                        help="Seconds a client polls one job before counting it as failed")
+    parser.add_argument("--health-interval", type=float, default=0.5, help="Seconds between /health probes")
+    parser.add_argument("--output", default="load_results.json", help="Where to write JSON results")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    stages = _parse_stages(args.stages)
+    data_dir = tempfile.mkdtemp(prefix="fac-load-")
+    options = {
+        "crew": args.crew, "crews": args.crews, "stages": stages, "jitter": args.jitter,
+        "llm_latency": args.llm_latency, "api_latency": args.api_latency, "data_dir": data_dir,
+    }
+    port = _free_port()
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.get_context("spawn").Process(target=_serve, args=(child, port, options), daemon=True)
+    server.start()
+    if not parent.poll(300) or parent.recv() != "ready":
+        raise SystemExit("API server did not start")
+    base = f"http://127.0.0.1:{port}"
+    print(f"API on {base} ({args.crew} crew, {args.crews} crews); {args.duration:.0f}s per level")
+
+    results = []
+    try:
+        for concurrency in levels:
+            results.append(run_level(base, parent, FixtureStore().symbols, concurrency, args))
+            _print_level(results[-1])
+    finally:
+        parent.send("stop")
+        parent.recv()
+        server.join(timeout=15)
+        shutil.rmtree(data_dir, ignore_errors=True)
+    _print_capacity(results)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "params": {**vars(args), "stages": {name: seconds for name, _, seconds in stages}},
+        },
+        "levels": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nLoad test results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# benchmarks/providers.py
+"""Local stand-in for the Finnhub and Alpha Vantage APIs, replaying recorded fixtures."""
+import json
+import os
+import pickle
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cache")
+
+class FixtureStore:
+    """
+    Recorded provider data loaded from cache pickles:
+    `{SYMBOL}_av_overview.pkl` (dict) and `{SYMBOL}_av_history_daily.pkl` (DataFrame).
+    """
+
+    def __init__(self, fixtures_dir: str = DEFAULT_FIXTURES_DIR):
+        self.overviews = {}
+        self.histories = {}
+        for name in sorted(os.listdir(fixtures_dir)):
+            if not name.endswith(".pkl"):
+                continue
+            symbol, _, data_type = name[:-4].partition("_")
+            if data_type not in ("av_overview", "av_history_daily"):
+                continue
+            with open(os.path.join(fixtures_dir, name), "rb") as f:
+                data = pickle.load(f)
+            if data_type == "av_overview":
+                self.overviews[symbol] = data
+            else:
+                self.histories[symbol] = data.sort_index()
+
+    @property
+    def symbols(self):
+        """Symbols with both an overview and a price history."""
+        return sorted(set(self.overviews) & set(self.histories))
+
+    # ---- Finnhub ----
+
+    def finnhub_quote(self, symbol):
+        hist = self.histories.get(symbol)
+        if hist is None or len(hist) < 2:
+            return {"c": 0, "d": None, "dp": None, "h": 0, "l": 0, "o": 0, "pc": 0, "t": 0}
+        last, prev = hist.iloc[-1], hist.iloc[-2]
+        change = float(last["Close"] - prev["Close"])
+        return {
+            "c": float(last["Close"]),
+            "d": change,
+            "dp": change / float(prev["Close"]) * 100,
+            "h": float(last["High"]),
+            "l": float(last["Low"]),
+            "o": float(last["Open"]),
+            "pc": float(prev["Close"]),
+            "t": int(hist.index[-1].timestamp()),
+        }
+
+    def finnhub_candles(self, symbol, start, end):
+        hist = self.histories.get(symbol)
+        if hist is None:
+            return {"s": "no_data"}
+        # Fixture dates are fixed: shift them so the last bar is `end`'s day,
+        # then replay the bars that fall inside the requested window
+        shift = int(end - hist.index[-1].timestamp()) // 86400 * 86400
+        stamps = [int(ts.timestamp()) + shift for ts in hist.index]
+        first = next((i for i, t in enumerate(stamps) if t >= start), len(stamps))
+        bars = hist.iloc[first:]
+        return {
+            "s": "ok",
+            "o": bars["Open"].tolist(),
+            "h": bars["High"].tolist(),
+            "l": bars["Low"].tolist(),
+            "c": bars["Close"].tolist(),
+            "v": bars["Volume"].tolist(),
+            "t": stamps[first:],
+        }
+
+    def finnhub_news(self, symbol, count=20):
+        if symbol not in self.overviews and symbol not in self.histories:
+            return []
+        now = int(time.time())
+        return [
+            {
+                "id": zlib.crc32(f"{symbol}-{i}".encode()),
+                "category": "company",
+                "datetime": now - i * 3600,
+                "headline": f"{symbol} headline {i}",
+                "source": "Fixture",
+                "summary": f"Recorded benchmark article {i} about {symbol}.",
+                "url": f"https://example.com/{symbol}/{i}",
+            }
+            for i in range(count)
+        ]
+
+    # ---- Alpha Vantage ----
+
+    def av_overview(self, symbol):
+        return self.overviews.get(symbol, {})
+
+    def av_daily(self, symbol):
+        hist = self.histories.get(symbol)
+        if hist is None:
+            return {"Error Message": "Invalid API call."}
+        series = {
+            ts.strftime("%Y-%m-%d"): {
+                "1. open": f"{row.Open:.4f}",
+                "2. high": f"{row.High:.4f}",
+                "3. low": f"{row.Low:.4f}",
+                "4. close": f"{row.Close:.4f}",
+                "5. volume": f"{int(row.Volume)}",
+            }
+            for ts, row in hist.iloc[::-1].iterrows()
+        }
+        return {"Meta Data": {"2. Symbol": symbol}, "Time Series (Daily)": series}
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        parsed = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        symbol = query.get("symbol", "").upper()
+        store = server.store
+
+        if parsed.path.startswith("/finnhub"):
+            provider = "finnhub"
+            route = parsed.path[len("/finnhub"):]
+            if route == "/quote":
+                body = store.finnhub_quote(symbol)
+            elif route == "/stock/candle":
+                body = store.finnhub_candles(symbol, int(query.get("from", 0)), int(query.get("to", 0)))
+            elif route == "/company-news":
+                body = store.finnhub_news(symbol)
+            else:
+                return self._reply(404, {"error": "unknown route"})
+        elif parsed.path == "/alphavantage/query":
+            provider = "alphavantage"
+            function = query.get("function")
+            if function == "OVERVIEW":
+                body = store.av_overview(symbol)
+            elif function == "TIME_SERIES_DAILY":
+                body = store.av_daily(symbol)
+            else:
+                return self._reply(404, {"error": "unknown function"})
+        else:
+            return self._reply(404, {"error": "unknown provider"})
+
+        with server.lock:
+            server.request_counts[provider] = server.request_counts.get(provider, 0) + 1
+        if server.latency:
+            time.sleep(server.latency)
+        self._reply(200, body)
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeProviderServer:
+    """
+    Threaded HTTP server answering Finnhub routes under `/finnhub` and
+    Alpha Vantage routes under `/alphavantage`, with optional per-request latency.
+    """
+
+    def __init__(self, store: FixtureStore, latency: float = 0.0, host: str = "127.0.0.1"):
+        self._httpd = ThreadingHTTPServer((host, 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.store = store
+        self._httpd.latency = latency
+        self._httpd.lock = threading.Lock()
+        self._httpd.request_counts = {}
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def finnhub_base_url(self) -> str:
+        return f"{self.base_url}/finnhub"
+
+    @property
+    def alpha_vantage_base_url(self) -> str:
+        return f"{self.base_url}/alphavantage"
+
+    @property
+    def request_counts(self) -> dict:
+        with self._httpd.lock:
+            return dict(self._httpd.request_counts)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,269 @@
+# benchmarks/run.py
+"""
+Offline benchmark suite.
+
+Runs against a local stand-in for Finnhub/Alpha Vantage (replaying the
+recorded fixtures in data/cache) and a stub LLM, so no API keys, network
+or Ollama are needed. Results are written as JSON; pass --compare to diff
+against an earlier run and fail on regressions.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --compare bench.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.providers import FakeProviderServer, FixtureStore
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def _stats(durations_ms, **extra) -> dict:
+    result = {
+        "runs": len(durations_ms),
+        "mean_ms": round(statistics.fmean(durations_ms), 3),
+        "p50_ms": round(_percentile(durations_ms, 50), 3),
+        "p95_ms": round(_percentile(durations_ms, 95), 3),
+        "min_ms": round(min(durations_ms), 3),
+        "max_ms": round(max(durations_ms), 3),
+    }
+    result.update(extra)
+    return result
+
+def measure(fn, runs: int, setup=None) -> dict:
+    """Time `fn` over `runs` iterations, calling `setup` (untimed) before each."""
+    durations = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return _stats(durations)
+
+def _configure_environment(server: FakeProviderServer, data_dir: str, pool_size: int):
+    """Point config at the stand-in providers before any project module is imported."""
+    os.environ.update({
+        "FINNHUB_BASE_URL": server.finnhub_base_url,
+        "ALPHA_VANTAGE_BASE_URL": server.alpha_vantage_base_url,
+        "FINNHUB_API_KEY": "benchmark",
+        "ALPHA_VANTAGE_API_KEY": "benchmark",
+        "DATA_DIR": data_dir,
+        "CREW_POOL_SIZE": str(pool_size),
+        "FINNHUB_RPM": "0",
+        "ALPHA_VANTAGE_RPM": "0",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+    })
+
+def _install_stub_llm(latency: float, symbols):
+    """Swap the agents' LLM for the stub; crews built afterwards inherit it."""
+    import agents
+    from benchmarks.stub_llm import StubLLM
+
+    stub = StubLLM(latency=latency, symbols=symbols)
+    for agent in (agents.market_researcher, agents.technical_analyst,
+                  agents.fundamental_analyst, agents.portfolio_manager):
+        agent.llm = stub
+    return stub
+
+def _clear_cache():
+    from config import CACHE_DIR
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+# ============= BENCHMARKS =============
+
+def bench_data_layer(symbols, runs) -> dict:
+    from tools.financial_tools import (
+        _fetch_av_overview,
+        _get_hybrid_history,
+        calculate_moving_averages,
+        calculate_rsi,
+        calculate_support_resistance,
+        fetch_market_summary,
+    )
+
+    def load_all():
+        for symbol in symbols:
+            _get_hybrid_history(symbol, 400)
+            _fetch_av_overview(symbol)
+
+    results = {
+        "cache_cold": measure(load_all, runs, setup=_clear_cache),
+    }
+    load_all()
+    results["cache_warm"] = measure(load_all, runs)
+
+    # Tools are called through their underlying functions to skip CrewAI's console output
+    for name, tool in (
+        ("fetch_market_summary", fetch_market_summary),
+        ("calculate_moving_averages", calculate_moving_averages),
+        ("calculate_rsi", calculate_rsi),
+        ("calculate_support_resistance", calculate_support_resistance),
+    ):
+        results[name] = measure(lambda: [tool.func(symbol) for symbol in symbols], runs)
+    return results
+
+def bench_crew(symbols, runs) -> dict:
+    from crew import create_financial_crew
+
+    def run_pipeline():
+        for symbol in symbols:
+            create_financial_crew().kickoff(inputs={
+                "stock_symbol": symbol,
+                "analysis_date": datetime.now().strftime("%Y-%m-%d"),
+            })
+
+    return {"crew_kickoff": measure(run_pipeline, runs)}
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def bench_api(symbols, jobs: int, concurrency: int) -> dict:
+    """Submit `jobs` analyses from `concurrency` clients and wait for all to finish."""
+    import requests
+    import uvicorn
+    import api
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    base = f"http://127.0.0.1:{port}"
+
+    def run_job(i):
+        start = time.perf_counter()
+        task_id = requests.post(f"{base}/analyze", json={"symbol": symbols[i % len(symbols)]}).json()["task_id"]
+        while True:
+            status = requests.get(f"{base}/status/{task_id}").json()["status"]
+            if status in ("completed", "failed"):
+                return (time.perf_counter() - start) * 1000, status
+            time.sleep(0.05)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(run_job, range(jobs)))
+        wall = time.perf_counter() - start
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    latencies = [ms for ms, _ in outcomes]
+    failed = sum(1 for _, status in outcomes if status != "completed")
+    return {
+        "api_throughput": _stats(
+            latencies,
+            concurrency=concurrency,
+            failed=failed,
+            wall_s=round(wall, 3),
+            jobs_per_second=round(jobs / wall, 3),
+        )
+    }
+
+# ============= COMPARISON =============
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Benchmarks whose mean got slower than baseline by more than `threshold` (fraction)."""
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("mean_ms"):
+            continue
+        change = (result["mean_ms"] - base["mean_ms"]) / base["mean_ms"]
+        print(f"{name:<30} {base['mean_ms']:>10.2f} -> {result['mean_ms']:>10.2f} ms  ({change:+.1%})")
+        if change > threshold:
+            regressions.append({"name": name, "baseline_ms": base["mean_ms"], "current_ms": result["mean_ms"], "change": round(change, 4)})
+    return regressions
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the financial analysis crew")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: all fixtures with history and overview)")
+    parser.add_argument("--runs", type=int, default=5, help="Iterations for data-layer benchmarks")
+    parser.add_argument("--crew-runs", type=int, default=2, help="Iterations for the full crew pipeline")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Seconds added to each provider response")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per stub LLM call")
+    parser.add_argument("--jobs", type=int, default=8, help="Jobs submitted in the /analyze benchmark")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent clients (and crew pool size)")
+    parser.add_argument("--skip", default="", help="Comma-separated groups to skip: data,crew,api")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write JSON results")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before failing --compare")
+    args = parser.parse_args()
+
+    store = FixtureStore()
+    symbols = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else store.symbols
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+
+    server = FakeProviderServer(store, latency=args.api_latency).start()
+    data_dir = tempfile.mkdtemp(prefix="fac-bench-")
+    _configure_environment(server, data_dir, args.concurrency)
+    _install_stub_llm(args.llm_latency, store.symbols)
+
+    results = {}
+    try:
+        if "data" not in skip:
+            results.update(bench_data_layer(symbols, args.runs))
+        if "crew" not in skip:
+            _clear_cache()
+            results.update(bench_crew(symbols, args.crew_runs))
+        if "api" not in skip:
+            _clear_cache()
+            results.update(bench_api(symbols, args.jobs, args.concurrency))
+    finally:
+        server.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "symbols": symbols,
+            "params": vars(args),
+            "provider_requests": server.request_counts,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nBenchmark results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:")
+            for r in regressions:
+                print(f"  {r['name']}: {r['change']:+.1%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+# broker.py
+"""
+Job broker for running crews on separate worker processes or hosts.
+
+The API enqueues jobs; workers (worker.py) claim them with a lease that
+expires after JOB_VISIBILITY_TIMEOUT seconds unless renewed by heartbeats.
+A job whose worker dies is put back on the queue once its lease expires,
+up to JOB_MAX_ATTEMPTS times, then marked failed.
+
+Two backends share one interface:
+  - redis://host:6379/0   Redis (or any server speaking its protocol and Lua)
+  - sqlite:///path/jobs.db  no external service; workers on the same host
+                            (or a filesystem with working locks)
+
+Each job carries a `record`: the dict `/status/{id}` returns (status,
+symbol, error, report_id, timings, ...). Fields are merged on update. As
+in jobs.py, the result text stays in the report archive, and finished
+jobs are deleted JOB_RETENTION_HOURS after they finish (Redis EXPIRE;
+SQLite rows are pruned on finish and claim).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from config import JOB_VISIBILITY_TIMEOUT, JOB_MAX_ATTEMPTS, JOB_RETENTION_HOURS
+
+# Seconds a finished job is kept
+RETENTION_SECONDS = max(1, int(JOB_RETENTION_HOURS * 3600))
+
+# A claimed job: `attempts` counts this claim
+Job = namedtuple("Job", ["id", "payload", "attempts"])
+
+def _lost_error(attempts: int) -> str:
+    # Same wording as the Redis requeue script
+    return f"Worker stopped responding ({attempts} attempt(s))"
+
+def connect(url: str):
+    """Broker for a `redis://`, `rediss://` or `sqlite:///` URL."""
+    scheme = urlparse(url).scheme
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisBroker(url)
+    if scheme == "sqlite":
+        return SQLiteBroker(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported JOB_BROKER_URL: {url}")
+
+# ============= SQLITE =============
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    record TEXT NOT NULL,
+    state TEXT NOT NULL,            -- queued | leased | done
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    enqueued_at REAL NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (state, enqueued_at);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    info TEXT NOT NULL,
+    last_seen REAL NOT NULL
+);
+"""
+
+class SQLiteBroker:
+    """Broker in a single SQLite file (WAL mode, one connection per thread)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "cancel_requested" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+        if "finished_at" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN finished_at REAL")
+            # Jobs finished before retention existed age from when they were queued
+            conn.execute("UPDATE jobs SET finished_at = enqueued_at WHERE state = 'done'")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        """Write transaction; IMMEDIATE takes the lock up front so claims can't race."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def enqueue(self, job_id: str, payload: dict, record: dict):
+        with self._tx() as db:
+            db.execute(
+                "INSERT INTO jobs (id, payload, record, state, enqueued_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, json.dumps(payload), json.dumps(record), time.time()),
+            )
+
+    @staticmethod
+    def _prune(db):
+        """Delete jobs finished more than RETENTION_SECONDS ago."""
+        db.execute("DELETE FROM jobs WHERE state = 'done' AND finished_at < ?", (time.time() - RETENTION_SECONDS,))
+
+    def claim(self, worker_id: str, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT):
+        """Lease the oldest queued job to `worker_id`, or None if the queue is empty."""
+        with self._tx() as db:
+            self._prune(db)
+            row = db.execute(
+                "SELECT id, payload, attempts FROM jobs WHERE state = 'queued' ORDER BY enqueued_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, payload, attempts = row
+            db.execute(
+                "UPDATE jobs SET state = 'leased', worker = ?, attempts = ?, lease_expires = ? WHERE id = ?",
+                (worker_id, attempts + 1, time.time() + visibility_timeout, job_id),
+            )
+        return Job(job_id, json.loads(payload), attempts + 1)
+
+    def heartbeat(self, worker_id: str, job_ids, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT) -> list:
+        """Extend the leases `worker_id` holds; returns the ids it no longer holds."""
+        lost = []
+        with self._tx() as db:
+            for job_id in job_ids:
+                cur = db.execute(
+                    "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                    (time.time() + visibility_timeout, job_id, worker_id),
+                )
+                if cur.rowcount == 0:
+                    lost.append(job_id)
+        return lost
+
+    def _merge(self, db, job_id, fields):
+        row = db.execute("SELECT record FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        record.update(fields)
+        return json.dumps(record)
+
+    def update(self, job_id: str, fields: dict):
+        with self._tx() as db:
+            record = self._merge(db, job_id, fields)
+            if record is not None:
+                db.execute("UPDATE jobs SET record = ? WHERE id = ?", (record, job_id))
+
+    def finish(self, job_id: str, worker_id: str, fields: dict) -> bool:
+        """Record the outcome if `worker_id` still holds the lease; False if it was lost."""
+        with self._tx() as db:
+            owner = db.execute(
+                "SELECT 1 FROM jobs WHERE id = ? AND worker = ? AND state = 'leased'", (job_id, worker_id)
+            ).fetchone()
+            if owner is None:
+                return False
+            db.execute(
+                "UPDATE jobs SET state = 'done', lease_expires = NULL, finished_at = ?, record = ? WHERE id = ?",
+                (time.time(), self._merge(db, job_id, fields), job_id),
+            )
+            self._prune(db)
+        return True
+
+    def requeue_expired(self, max_attempts: int = JOB_MAX_ATTEMPTS):
+        """Requeue (or fail, past `max_attempts`) jobs whose lease ran out. Returns (requeued, failed)."""
+        requeued = failed = 0
+        with self._tx() as db:
+            rows = db.execute(
+                "SELECT id, attempts, cancel_requested FROM jobs WHERE state = 'leased' AND lease_expires < ?",
+                (time.time(),),
+            ).fetchall()
+            for job_id, attempts, cancel_requested in rows:
+                if cancel_requested:
+                    fields = {"status": "cancelled", "cancel_reason": "cancelled", "error": "Cancelled by request"}
+                    db.execute(
+                        "UPDATE jobs SET state = 'done', lease_expires = NULL, finished_at = ?, record = ? WHERE id = ?",
+                        (time.time(), self._merge(db, job_id, fields), job_id),
+                    )
+                elif attempts < max_attempts:
+                    fields = {"status": "pending"}
+                    db.execute(
+                        "UPDATE jobs SET state = 'queued', worker = NULL, lease_expires = NULL, record = ? WHERE id = ?",
+                        (self._merge(db, job_id, fields), job_id),
+                    )
+                    requeued += 1
+                else:
+                    fields = {"status": "failed", "error": _lost_error(attempts)}
+                    db.execute(
+                        "UPDATE jobs SET state = 'done', lease_expires = NULL, finished_at = ?, record = ? WHERE id = ?",
+                        (time.time(), self._merge(db, job_id, fields), job_id),
+                    )
+                    failed += 1
+        return requeued, failed
+
+    def cancel(self, job_id: str):
+        """
+        Drop a queued job ("cancelled") or flag a leased one for its worker
+        ("cancelling"). Returns the resulting status, or None if unknown.
+        """
+        with self._tx() as db:
+            row = db.execute("SELECT state, record FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            state, record = row
+            if state == "queued":
+                fields = {"status": "cancelled", "cancel_reason": "cancelled", "error": "Cancelled by request"}
+                db.execute(
+                    "UPDATE jobs SET state = 'done', finished_at = ?, record = ? WHERE id = ?",
+                    (time.time(), self._merge(db, job_id, fields), job_id),
+                )
+                return "cancelled"
+            if state == "leased":
+                db.execute(
+                    "UPDATE jobs SET cancel_requested = 1, record = ? WHERE id = ?",
+                    (self._merge(db, job_id, {"cancel_requested": True}), job_id),
+                )
+                return "cancelling"
+            return json.loads(record)["status"]
+
+    def cancel_requested(self, job_ids) -> list:
+        """The subset of `job_ids` flagged for cancellation."""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        rows = self._conn().execute(
+            f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({','.join('?' * len(job_ids))})", job_ids
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get(self, job_id: str):
+        row = self._conn().execute("SELECT record, attempts, worker FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        record.update({"attempts": row[1], "worker": row[2]})
+        return record
+
+    def register_worker(self, worker_id: str, info: dict):
+        with self._tx() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO workers (id, info, last_seen) VALUES (?, ?, ?)",
+                (worker_id, json.dumps(info), time.time()),
+            )
+
+    def remove_worker(self, worker_id: str):
+        with self._tx() as db:
+            db.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def workers(self, max_age: float = JOB_VISIBILITY_TIMEOUT) -> list:
+        """Workers seen within `max_age` seconds; older entries (dead workers) are removed."""
+        cutoff = time.time() - max_age
+        with self._tx() as db:
+            db.execute("DELETE FROM workers WHERE last_seen < ?", (cutoff,))
+            rows = db.execute("SELECT id, info, last_seen FROM workers").fetchall()
+        return [dict(json.loads(info), id=wid, last_seen=last_seen) for wid, info, last_seen in rows]
+
+    def stats(self) -> dict:
+        counts = dict(self._conn().execute(
+            "SELECT state, COUNT(*) FROM jobs WHERE state != 'done' GROUP BY state"
+        ).fetchall())
+        return {"queued": counts.get("queued", 0), "running": counts.get("leased", 0)}
+
+# ============= REDIS =============
+
+# KEYS: queue, leases; ARGV: lease expiry, worker id, job key prefix
+_CLAIM = """
+local id = redis.call('RPOP', KEYS[1])
+if not id then return nil end
+local key = ARGV[3] .. id
+redis.call('ZADD', KEYS[2], ARGV[1], id)
+local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+redis.call('HSET', key, 'state', 'leased', 'worker', ARGV[2])
+return {id, redis.call('HGET', key, 'payload'), attempts}
+"""
+
+# KEYS: leases; ARGV: lease expiry, worker id, job key prefix, job ids...
+_HEARTBEAT = """
+local lost = {}
+for i = 4, #ARGV do
+  local key = ARGV[3] .. ARGV[i]
+  if redis.call('HGET', key, 'worker') == ARGV[2] and redis.call('HGET', key, 'state') == 'leased' then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[i])
+  else
+    table.insert(lost, ARGV[i])
+  end
+end
+return lost
+"""
+
+# KEYS: leases, job key; ARGV: job id, worker id, retention seconds, field/value pairs...
+_FINISH = """
+if redis.call('HGET', KEYS[2], 'worker') ~= ARGV[2] or redis.call('HGET', KEYS[2], 'state') ~= 'leased' then
+  return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[2], 'state', 'done')
+for i = 4, #ARGV, 2 do
+  redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 1
+"""
+
+# KEYS: job key; ARGV: field/value pairs...
+# (only if the job still exists, so an expired job isn't recreated without a TTL)
+_UPDATE = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+for i = 1, #ARGV, 2 do
+  redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+# KEYS: queue, leases; ARGV: now, max attempts, job key prefix, retention seconds
+_REQUEUE = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+local requeued, failed = 0, 0
+for _, id in ipairs(ids) do
+  redis.call('ZREM', KEYS[2], id)
+  local key = ARGV[3] .. id
+  local attempts = tonumber(redis.call('HGET', key, 'attempts') or '0')
+  if redis.call('HGET', key, 'cancel') == '1' then
+    redis.call('HSET', key, 'state', 'done', 'r:status', '"cancelled"', 'r:cancel_reason', '"cancelled"',
+               'r:error', '"Cancelled by request"')
+    redis.call('EXPIRE', key, ARGV[4])
+  elseif attempts < tonumber(ARGV[2]) then
+    redis.call('HSET', key, 'state', 'queued', 'r:status', '"pending"')
+    redis.call('HDEL', key, 'worker')
+    -- Retries go to the consuming end so they run next
+    redis.call('RPUSH', KEYS[1], id)
+    requeued = requeued + 1
+  else
+    local error = 'Worker stopped responding (' .. attempts .. ' attempt(s))'
+    redis.call('HSET', key, 'state', 'done', 'r:status', '"failed"', 'r:error', cjson.encode(error))
+    redis.call('EXPIRE', key, ARGV[4])
+    failed = failed + 1
+  end
+end
+return {requeued, failed}
+"""
+
+# KEYS: queue, job key; ARGV: job id, retention seconds
+_CANCEL = """
+local state = redis.call('HGET', KEYS[2], 'state')
+if not state then return nil end
+if state == 'queued' then
+  redis.call('LREM', KEYS[1], 0, ARGV[1])
+  redis.call('HSET', KEYS[2], 'state', 'done', 'r:status', '"cancelled"', 'r:cancel_reason', '"cancelled"',
+             'r:error', '"Cancelled by request"')
+  redis.call('EXPIRE', KEYS[2], ARGV[2])
+  return 'cancelled'
+end
+if state == 'leased' then
+  redis.call('HSET', KEYS[2], 'cancel', '1', 'r:cancel_requested', 'true')
+  return 'cancelling'
+end
+return cjson.decode(redis.call('HGET', KEYS[2], 'r:status'))
+"""
+
+class RedisBroker:
+    """
+    Broker on Redis: a list as the queue, a sorted set of lease expiries,
+    and one hash per job (record fields stored as `r:<name>` JSON values).
+    State changes run as Lua scripts so they are atomic across workers.
+    """
+
+    def __init__(self, url: str, prefix: str = "fac"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("JOB_BROKER_URL points at Redis but the `redis` package is not installed") from e
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._queue = f"{prefix}:queue"
+        self._leases = f"{prefix}:leases"
+        self._workers = f"{prefix}:workers"
+        self._job_prefix = f"{prefix}:job:"
+        self._claim = self.redis.register_script(_CLAIM)
+        self._heartbeat = self.redis.register_script(_HEARTBEAT)
+        self._finish = self.redis.register_script(_FINISH)
+        self._update = self.redis.register_script(_UPDATE)
+        self._requeue = self.redis.register_script(_REQUEUE)
+        self._cancel = self.redis.register_script(_CANCEL)
+
+    def _key(self, job_id: str) -> str:
+        return self._job_prefix + job_id
+
+    @staticmethod
+    def _encode(fields: dict) -> dict:
+        return {f"r:{k}": json.dumps(v) for k, v in fields.items()}
+
+    def enqueue(self, job_id: str, payload: dict, record: dict):
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key(job_id), mapping={
+            "payload": json.dumps(payload),
+            "state": "queued",
+            "attempts": 0,
+            **self._encode(record),
+        })
+        pipe.lpush(self._queue, job_id)
+        pipe.execute()
+
+    def claim(self, worker_id: str, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT):
+        result = self._claim(
+            keys=[self._queue, self._leases],
+            args=[time.time() + visibility_timeout, worker_id, self._job_prefix],
+        )
+        if not result:
+            return None
+        job_id, payload, attempts = result
+        return Job(job_id, json.loads(payload), int(attempts))
+
+    def heartbeat(self, worker_id: str, job_ids, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT) -> list:
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        return list(self._heartbeat(
+            keys=[self._leases],
+            args=[time.time() + visibility_timeout, worker_id, self._job_prefix, *job_ids],
+        ))
+
+    def update(self, job_id: str, fields: dict):
+        pairs = [item for kv in self._encode(fields).items() for item in kv]
+        self._update(keys=[self._key(job_id)], args=pairs)
+
+    def finish(self, job_id: str, worker_id: str, fields: dict) -> bool:
+        pairs = [item for kv in self._encode(fields).items() for item in kv]
+        return bool(self._finish(keys=[self._leases, self._key(job_id)], args=[job_id, worker_id, RETENTION_SECONDS, *pairs]))
+
+    def requeue_expired(self, max_attempts: int = JOB_MAX_ATTEMPTS):
+        requeued, failed = self._requeue(
+            keys=[self._queue, self._leases],
+            args=[time.time(), max_attempts, self._job_prefix, RETENTION_SECONDS],
+        )
+        return int(requeued), int(failed)
+
+    def cancel(self, job_id: str):
+        return self._cancel(keys=[self._queue, self._key(job_id)], args=[job_id, RETENTION_SECONDS])
+
+    def cancel_requested(self, job_ids) -> list:
+        job_ids = list(job_ids)
+        pipe = self.redis.pipeline()
+        for job_id in job_ids:
+            pipe.hget(self._key(job_id), "cancel")
+        return [job_id for job_id, flag in zip(job_ids, pipe.execute()) if flag == "1"]
+
+    def get(self, job_id: str):
+        data = self.redis.hgetall(self._key(job_id))
+        if not data:
+            return None
+        record = {k[2:]: json.loads(v) for k, v in data.items() if k.startswith("r:")}
+        record.update({"attempts": int(data.get("attempts", 0)), "worker": data.get("worker")})
+        return record
+
+    def register_worker(self, worker_id: str, info: dict):
+        self.redis.hset(self._workers, worker_id, json.dumps(dict(info, last_seen=time.time())))
+
+    def remove_worker(self, worker_id: str):
+        self.redis.hdel(self._workers, worker_id)
+
+    def workers(self, max_age: float = JOB_VISIBILITY_TIMEOUT) -> list:
+        """Workers seen within `max_age` seconds; older entries (dead workers) are removed."""
+        cutoff = time.time() - max_age
+        seen = [dict(json.loads(info), id=wid) for wid, info in self.redis.hgetall(self._workers).items()]
+        stale = [w["id"] for w in seen if w["last_seen"] < cutoff]
+        if stale:
+            self.redis.hdel(self._workers, *stale)
+        return [w for w in seen if w["last_seen"] >= cutoff]
+
+    def stats(self) -> dict:
+        return {"queued": self.redis.llen(self._queue), "running": self.redis.zcard(self._leases)}
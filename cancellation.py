@@ -0,0 +1,113 @@
+# cancellation.py
+"""
+Cooperative cancellation for analysis jobs.
+
+A CancelToken is activated for the thread running a job (like a profiling
+Trace). Code on the job's path calls `check_cancelled()` at step boundaries
+(every LLM call) and waits through `CancelToken.wait_for`/`sleep`, so a
+cancelled or overdue job stops at the next boundary and blocking HTTP
+fetches are abandoned immediately.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+_current_token = contextvars.ContextVar("current_cancel_token", default=None)
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a cancelled job. A BaseException (like asyncio.CancelledError)
+    so CrewAI's retry and tool error handling, which catch Exception, let it through.
+    """
+
+    MESSAGES = {"cancelled": "Cancelled by request", "deadline": "Deadline exceeded"}
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(self.MESSAGES.get(reason, reason))
+        self.reason = reason
+
+class CancelToken:
+    """Cancellation flag plus optional deadline (seconds from now) for one job."""
+
+    def __init__(self, deadline_seconds: float = None):
+        self.set_deadline(deadline_seconds)
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def set_deadline(self, seconds: float):
+        """(Re)start the deadline `seconds` from now; None removes it."""
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+
+    def cancel(self, reason: str = "cancelled"):
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks = list(self._callbacks)
+        self._event.set()
+        for callback in callbacks:
+            callback()
+
+    @property
+    def cancelled(self) -> bool:
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self.reason is not None
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled(self.reason)
+
+    def bound_timeout(self, timeout):
+        """`timeout` capped to the time left before the deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def sleep(self, seconds: float):
+        """time.sleep that wakes up (and raises) on cancellation or deadline."""
+        self._event.wait(self.bound_timeout(seconds))
+        self.check()
+
+    def wait_for(self, future):
+        """Result of a concurrent future, abandoning it if the job is cancelled first."""
+        done = threading.Event()
+        future.add_done_callback(lambda _: done.set())
+        with self._lock:
+            self._callbacks.append(done.set)
+        try:
+            # A cancel() before the callback was registered wouldn't set `done`
+            self.check()
+            while not done.wait(self.bound_timeout(None)):
+                self.check()  # Deadline reached while waiting
+            self.check()
+        finally:
+            with self._lock:
+                self._callbacks.remove(done.set)
+        return future.result()
+
+@contextmanager
+def activate(token: CancelToken):
+    """Make `token` the cancellation token for this context."""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+def current_token():
+    return _current_token.get()
+
+def check_cancelled():
+    """Raise JobCancelled if the current job was cancelled or ran past its deadline."""
+    token = _current_token.get()
+    if token is not None:
+        token.check()
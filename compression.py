@@ -0,0 +1,131 @@
+# compression.py
+"""
+gzip / zstd codecs shared by the report archive and the API.
+
+gzip is always available; zstd needs the optional `zstandard` package and
+is simply not offered (or stored) without it.
+"""
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # Optional: pip install zstandard
+    zstandard = None
+
+# File suffix per Content-Encoding token
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+def available(encoding: str) -> bool:
+    return encoding == "gzip" or (encoding == "zstd" and zstandard is not None)
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, GZIP_LEVEL, mtime=0)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding is None:
+        return data
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed data but the `zstandard` package is not installed")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def compressor(encoding: str):
+    """Streaming compressor with `compress(chunk)` and `flush()`."""
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def negotiate(accept_encoding: str, offered=("zstd", "gzip")):
+    """First of `offered` that the Accept-Encoding header allows (and we can produce), else None."""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+    for encoding in offered:
+        if available(encoding) and weights.get(encoding, weights.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+class CompressionMiddleware:
+    """
+    ASGI middleware encoding responses with zstd or gzip per Accept-Encoding.
+
+    Bodies under `minimum_size` and responses that already carry a
+    Content-Encoding (e.g. reports served as stored) pass through untouched;
+    streamed bodies are compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, encodings=("zstd", "gzip")):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = encodings
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = negotiate(accept, self.encodings)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        stream = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, stream, passthrough
+            if passthrough or message["type"] not in ("http.response.start", "http.response.body"):
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message  # Held until the first body chunk decides
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is not None:
+                data = stream.compress(body)
+                if not more_body:
+                    data += stream.flush()
+                return await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+            headers = [(k, v) for k, v in start["headers"] if k.lower() != b"content-length"]
+            if any(k.lower() == b"content-encoding" for k, _ in headers) or (
+                    not more_body and len(body) < self.minimum_size):
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            if more_body:
+                stream = compressor(encoding)
+                data = stream.compress(body)
+            else:
+                data = compress(body, encoding)
+                headers.append((b"content-length", str(len(data)).encode()))
+            headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -14,12 +14,90 @@ GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini/gemini-1.5-flash")
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
 
+# Provider endpoints (overridable to point at a local stand-in, e.g. benchmarks)
+FINNHUB_BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
+ALPHA_VANTAGE_BASE_URL = os.getenv("ALPHA_VANTAGE_BASE_URL", "https://www.alphavantage.co")
+
+# Provider request budgets per minute (0 disables client-side limiting)
+FINNHUB_RPM = int(os.getenv("FINNHUB_RPM", "60"))
+ALPHA_VANTAGE_RPM = int(os.getenv("ALPHA_VANTAGE_RPM", "5"))
+
+# Intraday bars: resolution fetched and cached (coarser ones are downsampled
+# from it), days fetched on first use, bars kept per symbol, minutes fresh
+INTRADAY_BASE_RESOLUTION = os.getenv("INTRADAY_BASE_RESOLUTION", "1")
+INTRADAY_HISTORY_DAYS = int(os.getenv("INTRADAY_HISTORY_DAYS", "30"))
+INTRADAY_MAX_BARS = int(os.getenv("INTRADAY_MAX_BARS", "12000"))
+INTRADAY_CACHE_MINUTES = float(os.getenv("INTRADAY_CACHE_MINUTES", "5"))
+
+# How long fetched company news stays fresh in the cache
+NEWS_CACHE_HOURS = float(os.getenv("NEWS_CACHE_HOURS", "6"))
+# Days of news kept per symbol, and headlines the news tool returns
+NEWS_RETENTION_DAYS = int(os.getenv("NEWS_RETENTION_DAYS", "30"))
+NEWS_TOP_N = int(os.getenv("NEWS_TOP_N", "5"))
+
+# How long failed lookups are remembered before the provider is asked again
+NEGATIVE_CACHE_NOT_FOUND_SECONDS = int(os.getenv("NEGATIVE_CACHE_NOT_FOUND_SECONDS", "900"))
+NEGATIVE_CACHE_ERROR_SECONDS = int(os.getenv("NEGATIVE_CACHE_ERROR_SECONDS", "60"))
+
 # Project Configuration
 PROJECT_NAME = "Financial Analysis Crew"
-DATA_DIR = "data"
+DATA_DIR = os.getenv("DATA_DIR", "data")
 REPORTS_DIR = os.path.join(DATA_DIR, "reports")
 CACHE_DIR = os.path.join(DATA_DIR, "cache")
 
+# Codec for archived reports (gzip, zstd = needs `zstandard`, none) and the
+# smallest API response body worth compressing
+REPORT_COMPRESSION = os.getenv("REPORT_COMPRESSION", "gzip").lower()
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+
+# Number of pre-built crews the API keeps ready (caps concurrent analyses)
+CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", "2"))
+
+# Ask an agent for its final answer as soon as its task's required tools have
+# all returned (REQUIRED_TOOLS in tasks.py) instead of letting it loop on
+AGENT_EARLY_EXIT = os.getenv("AGENT_EARLY_EXIT", "true").lower() in ("1", "true", "yes")
+
+# In-process scheduling between priority classes: relative share of the crews
+# each class gets while both have jobs waiting, and the most crews batch jobs
+# may hold (default all but one, kept free for interactive requests)
+JOB_CLASS_SHARES = {
+    name.strip(): float(share)
+    for name, share in (
+        part.split("=") for part in os.getenv("JOB_CLASS_SHARES", "interactive=3,batch=1").split(",") if part.strip()
+    )
+}
+BATCH_MAX_CREWS = int(os.getenv("BATCH_MAX_CREWS", str(max(1, CREW_POOL_SIZE - 1))))
+
+# Default per-job deadline in seconds (0 = none); /analyze may set its own.
+# Interactive jobs count it from submission, batch jobs from when they start.
+JOB_DEADLINE_SECONDS = int(os.getenv("JOB_DEADLINE_SECONDS", "900"))
+
+# Finished jobs the API keeps for /status (most recent first), and for how
+# long (the broker keeps finished jobs for JOB_RETENTION_HOURS too); results
+# stay in the report archive after a job is dropped
+JOB_RETENTION_COUNT = int(os.getenv("JOB_RETENTION_COUNT", "1000"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+# Distributed execution: when set, the API only enqueues jobs and worker.py
+# processes run the crews (redis://host:6379/0 or sqlite:///data/jobs.db)
+JOB_BROKER_URL = os.getenv("JOB_BROKER_URL", "")
+# Seconds a claimed job stays leased without a heartbeat before it is retried
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+WORKER_HEARTBEAT_SECONDS = int(os.getenv("WORKER_HEARTBEAT_SECONDS", "15"))
+
+# Process pool for bulk indicator math (screening, backtests); 0 = one worker per CPU.
+# Batches up to COMPUTE_CHUNK_SYMBOLS symbols are computed in-process.
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", "0"))
+COMPUTE_CHUNK_SYMBOLS = int(os.getenv("COMPUTE_CHUNK_SYMBOLS", "256"))
+
+# Cache prefetch: symbols to keep warm and when to refresh them
+# (weekdays, HH:MM in MARKET_TIMEZONE; default just after close and before open)
+WATCHLIST = [s.strip().upper() for s in os.getenv("WATCHLIST", "").split(",") if s.strip()]
+PREFETCH_TIMES = [t.strip() for t in os.getenv("PREFETCH_TIMES", "16:30,08:30").split(",") if t.strip()]
+MARKET_TIMEZONE = os.getenv("MARKET_TIMEZONE", "America/New_York")
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+
 # Create directories if they don't exist
 os.makedirs(REPORTS_DIR, exist_ok=True)
 os.makedirs(CACHE_DIR, exist_ok=True)
@@ -1,31 +1,115 @@
 # crew.py
+import queue
+import threading
+from contextlib import contextmanager
+
 from crewai import Crew, Process
+from crewai.utilities import RPMController
+
 from agents import (
     market_researcher,
     technical_analyst,
     fundamental_analyst,
     portfolio_manager
 )
-from tasks import create_tasks
-
-def create_financial_crew(stock_symbol: str) -> Crew:
-    """Create and configure the financial analysis crew"""
-    
-    tasks = create_tasks(stock_symbol)
-    
-    crew = Crew(
-        agents=[
-            market_researcher,
-            technical_analyst,
-            fundamental_analyst,
-            portfolio_manager,
-        ],
-        tasks=tasks,
-        process=Process.sequential,  # Tasks run one after another
-        verbose=True,
-        memory=False,  # Disabled to avoid OpenAI embedding requirement
-        cache=True,
-        max_rpm=100,  # Rate limiting
-    )
-    
+from config import CREW_POOL_SIZE
+from profiling import crew_started, task_finished
+from tasks import create_tasks, REQUIRED_TOOLS
+from tool_loop import reset_tool_loop, relax_tool_schemas
+
+_template_crew = None
+_template_lock = threading.Lock()
+
+def _get_template_crew() -> Crew:
+    """Build the templated crew once; every other crew is a copy of it."""
+    global _template_crew
+    with _template_lock:
+        if _template_crew is None:
+            agents = [market_researcher, technical_analyst, fundamental_analyst, portfolio_manager]
+            relax_tool_schemas({tool.name: tool for agent in agents for tool in agent.tools}.values())
+            _template_crew = Crew(
+                agents=[
+                    market_researcher,
+                    technical_analyst,
+                    fundamental_analyst,
+                    portfolio_manager,
+                ],
+                tasks=create_tasks(),
+                process=Process.sequential,  # Tasks run one after another
+                verbose=True,
+                memory=False,  # Disabled to avoid OpenAI embedding requirement
+                cache=True,
+                max_rpm=100,  # Rate limiting
+                before_kickoff_callbacks=[crew_started],  # Task timing spans
+                task_callback=task_finished,
+            )
+    return _template_crew
+
+def create_financial_crew() -> Crew:
+    """
+    Create and configure the financial analysis crew.
+
+    The returned crew owns its own copies of the agents and tasks. The stock
+    symbol is supplied at run time via `kickoff(inputs={"stock_symbol": ...})`.
+    """
+    crew = _get_template_crew().copy()
+    _reset_run_state(crew)
     return crew
+
+def _reset_run_state(crew: Crew) -> None:
+    """Give a crew a fresh tool memo and RPM window before its next run."""
+    # Tool results are memoized per run only (keyed on tool input), so a
+    # reused crew never serves yesterday's price to the next job.
+    reset_tool_loop(crew, REQUIRED_TOOLS)
+    # Outputs are read back as partial results when a job is cut off
+    for task in crew.tasks:
+        task.output = None
+    crew._rpm_controller = RPMController(max_rpm=crew.max_rpm)
+    for agent in crew.agents:
+        agent._rpm_controller = None
+        agent.set_rpm_controller(crew._rpm_controller)
+
+def finished_task_outputs(crew: Crew) -> list:
+    """Outputs of the tasks a crew completed in its current run (partial results of a cut-off job)."""
+    return [
+        {"agent": task.agent.role if task.agent else None, "output": task.output.raw}
+        for task in crew.tasks
+        if task.output is not None
+    ]
+
+class CrewPool:
+    """
+    Fixed-size pool of pre-built crews.
+
+    Each job checks out a crew for the duration of its run, so concurrent jobs
+    never share agent state. When all crews are busy, `checkout` blocks until
+    one is returned.
+    """
+
+    def __init__(self, size: int = CREW_POOL_SIZE):
+        self.size = max(1, size)
+        self._crews: "queue.Queue[Crew]" = queue.Queue()
+        for _ in range(self.size):
+            self._crews.put(create_financial_crew())
+
+    @property
+    def available(self) -> int:
+        return self._crews.qsize()
+
+    def acquire(self, timeout=None) -> Crew:
+        """Take a crew out of the pool, blocking until one is free."""
+        return self._crews.get(timeout=timeout)
+
+    def release(self, crew: Crew) -> None:
+        """Reset a crew's per-run state and return it to the pool."""
+        _reset_run_state(crew)
+        self._crews.put(crew)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow a crew for the duration of a `with` block."""
+        crew = self.acquire(timeout=timeout)
+        try:
+            yield crew
+        finally:
+            self.release(crew)
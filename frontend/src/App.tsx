@@ -9,7 +9,7 @@ import clsx from 'clsx';
 
 // Types
 interface JobStatus {
-  status: 'pending' | 'running' | 'completed' | 'failed';
+  status: 'pending' | 'running' | 'completed' | 'failed' | 'cancelled';
   result?: string;
   error?: string;
 }
@@ -70,8 +70,7 @@ function App() {
             setRawResult(job.result);
             parseResults(job.result);
             clearInterval(interval);
-          } else if (job.status === 'failed') {
-            setStatus('failed');
+          } else if (job.status === 'failed' || job.status === 'cancelled') {
             setError(job.error || 'Analysis failed');
             clearInterval(interval);
           }
@@ -125,7 +124,8 @@ function App() {
     switch (status) {
       case 'running': return 'bg-blue-100 text-blue-700 border-blue-200';
       case 'completed': return 'bg-green-100 text-green-700 border-green-200';
-      case 'failed': return 'bg-red-100 text-red-700 border-red-200';
+      case 'failed':
+      case 'cancelled': return 'bg-red-100 text-red-700 border-red-200';
       default: return 'bg-gray-100 text-gray-700 border-gray-200';
     }
   };
@@ -0,0 +1,163 @@
+# jobs.py
+"""
+In-process job records for the API (when it runs crews itself).
+
+A JobRecord has a fixed set of fields (`__slots__`) and no report text:
+a finished job references its archived report by `report_id`, and
+`to_dict()` reads the result back from the archive for /status (the last
+REPORT_CACHE reports read stay decoded, for clients polling a finished
+job). JobStore keeps at most JOB_RETENTION_COUNT finished jobs, none
+older than JOB_RETENTION_HOURS, and the timing trace of only the last
+KEEP_TRACES of them; pending and running jobs are never evicted. Memory
+therefore stays flat however many jobs a long-lived API process serves.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+
+from config import JOB_RETENTION_COUNT, JOB_RETENTION_HOURS
+from reports import find_report, load_report
+
+# Statuses after which a job can no longer be cancelled
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+# Finished jobs whose full timing trace (spans) is kept for /status/{id}/timings
+KEEP_TRACES = 100
+
+# Decoded reports kept for /status of finished jobs (reports never change once written)
+REPORT_CACHE = 32
+
+class JobRecord:
+    """One job: its request, progress and outcome, plus its live trace and cancel token."""
+
+    # Fields returned by /status, in order; unset (None) ones are left out
+    FIELDS = (
+        "status", "symbol", "priority", "client_id", "submitted_at", "deadline_seconds",
+        "cancel_requested", "cancel_reason", "error", "report_file", "report_id", "timings", "agents",
+    )
+    __slots__ = FIELDS + ("task_id", "finished_at", "trace", "token")
+
+    def __init__(self, task_id: str, symbol: str, priority: str, client_id: str, submitted_at: str,
+                 deadline_seconds: float = None, trace=None, token=None):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        self.task_id = task_id
+        self.status = "pending"
+        self.symbol = symbol
+        self.priority = priority
+        self.client_id = client_id
+        self.submitted_at = submitted_at
+        self.deadline_seconds = deadline_seconds
+        self.trace = trace
+        self.token = token
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> dict:
+        """The /status view; `result` / `partial_result` are read from the archived report."""
+        return with_result({name: getattr(self, name) for name in self.FIELDS if getattr(self, name) is not None})
+
+@lru_cache(maxsize=REPORT_CACHE)
+def _load_report(report_id: str) -> dict:
+    path = find_report(report_id)
+    if path is None:
+        raise FileNotFoundError("not in the archive")
+    return load_report(path)
+
+def _report(report_id: str):
+    if not report_id:
+        return None
+    try:
+        return _load_report(report_id)
+    except Exception as e:  # Not cached, so a later poll tries again
+        print(f"Could not read report {report_id}: {e}")
+        return None
+
+def with_result(record: dict) -> dict:
+    """
+    A /status record (local or from the broker) with `result` (completed) or
+    `partial_result` (cancelled) read from the report its `report_id` names.
+    """
+    status = record.get("status")
+    if status not in ("completed", "cancelled"):
+        return record
+    report = _report(record.get("report_id"))
+    if status == "completed":
+        record["result"] = report.get("report") if report else None
+    else:
+        record["partial_result"] = report.get("tasks", []) if report else []
+    return record
+
+class JobStore:
+    """Job records by task id, with bounded retention of finished jobs."""
+
+    def __init__(self, max_finished: int = JOB_RETENTION_COUNT, max_age_hours: float = JOB_RETENTION_HOURS):
+        self.max_finished = max(1, max_finished)
+        self.max_age = max_age_hours * 3600
+        self.evicted = 0
+        self._jobs = {}
+        self._finished = OrderedDict()  # task id -> finished_at, oldest first
+        self._traced = deque()  # finished jobs still holding their trace, oldest first
+        self._lock = threading.Lock()
+
+    def add(self, job: JobRecord):
+        with self._lock:
+            self._jobs[job.task_id] = job
+
+    def get(self, task_id: str):
+        return self._jobs.get(task_id)
+
+    def __getitem__(self, task_id: str) -> JobRecord:
+        return self._jobs[task_id]
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._jobs
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def finish(self, task_id: str, status: str, **fields):
+        """Record a job's outcome (`fields` are JobRecord fields) and apply retention."""
+        job = self._jobs[task_id]
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.status = status
+        job.finished_at = time.monotonic()
+        job.token = None
+        with self._lock:
+            self._finished[task_id] = job.finished_at
+            self._traced.append(task_id)
+            while len(self._traced) > KEEP_TRACES:
+                # Older finished jobs keep only their timing summary
+                older = self._jobs.get(self._traced.popleft())
+                if older is not None:
+                    older.trace = None
+            self._prune()
+
+    def _prune(self):
+        now = time.monotonic()
+        while self._finished:
+            task_id, finished_at = next(iter(self._finished.items()))
+            if len(self._finished) <= self.max_finished and now - finished_at <= self.max_age:
+                break
+            del self._finished[task_id]
+            self._jobs.pop(task_id, None)
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._prune()
+            by_status = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+            return {
+                "retained": len(self._jobs),
+                "by_status": by_status,
+                "traces": sum(1 for job in self._jobs.values() if job.trace is not None),
+                "evicted": self.evicted,
+                "max_finished": self.max_finished,
+                "max_age_hours": self.max_age / 3600,
+            }
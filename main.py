@@ -2,10 +2,12 @@
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 import json
+import os
 from datetime import datetime
 from crew import create_financial_crew
-from config import REPORTS_DIR
-import os
+from tool_loop import agent_loop_stats
+from reports import save_report, report_id
+from profiling import Trace, activate
 
 def analyze_stock(stock_symbol: str):
     """
@@ -21,7 +23,7 @@ def analyze_stock(stock_symbol: str):
     
     try:
         # Create the crew
-        crew = create_financial_crew(stock_symbol.upper())
+        crew = create_financial_crew()
         
         # Prepare inputs for the crew
         inputs = {
@@ -33,20 +35,13 @@ def analyze_stock(stock_symbol: str):
         print("⏳ This may take 3-5 minutes...\n")
         
         # Run the crew
-        result = crew.kickoff(inputs=inputs)
+        trace = Trace(stock_symbol.upper())
+        with activate(trace):
+            result = crew.kickoff(inputs=inputs)
+        agents = agent_loop_stats(crew)
         
         # Save results
-        report_filename = os.path.join(
-            REPORTS_DIR,
-            f"{stock_symbol.upper()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        )
-        
-        with open(report_filename, 'w') as f:
-            json.dump({
-                "symbol": stock_symbol.upper(),
-                "analysis_date": datetime.now().isoformat(),
-                "report": str(result),
-            }, f, indent=2)
+        report_filename = save_report(stock_symbol, result)
         
         # Print results
         print("\n" + "="*80)
@@ -55,6 +50,29 @@ def analyze_stock(stock_symbol: str):
         print(f"\n{result}\n")
         print(f"\n📁 Report saved to: {report_filename}")
         
+        # Timing breakdown
+        timings = trace.summary()
+        print(f"\n⏱️  Total time: {timings['wall_ms'] / 1000:.1f}s")
+        for category, stats in sorted(timings["categories"].items()):
+            line = f"   {category:<8} {stats['count']:>4} spans  {stats['duration_ms'] / 1000:>8.2f}s"
+            if "total_tokens" in stats:
+                line += f"  {stats['total_tokens']} tokens"
+            print(line)
+        
+        print("\n🔁 Agent iterations:")
+        for role, stats in agents.items():
+            line = f"   {role:<32} {stats['iterations']:>2}/{stats['max_iter']:<2} {stats['tool_calls']} tool calls"
+            if stats["memo_hits"]:
+                line += f", {stats['memo_hits']} from memo"
+            if stats["early_exit"]:
+                line += ", early exit"
+            print(line)
+        
+        trace_filename = os.path.join(os.path.dirname(report_filename), f"{report_id(report_filename)}.trace.json")
+        with open(trace_filename, 'w') as f:
+            json.dump(trace.to_chrome_trace(), f)
+        print(f"📁 Chrome trace saved to: {trace_filename}")
+        
     except Exception as e:
         print(f"\n❌ Error during analysis: {str(e)}")
         print("\nTroubleshooting tips:")
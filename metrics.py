@@ -0,0 +1,195 @@
+# metrics.py
+import bisect
+import os
+import sys
+import threading
+from abc import ABC, abstractmethod
+
+# Every metric registers itself here; render() walks this list
+REGISTRY = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{_escape(v)}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric(ABC):
+    """Base class: a named metric with a fixed set of label names."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    @abstractmethod
+    def _samples(self):
+        """`(sample name, formatted labels, value)` per exposed sample."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        lines += [f"{name}{labels} {_format_value(value)}" for name, labels, value in self._samples()]
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, k), v) for k, v in items]
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with a fixed set of upper bounds."""
+
+    type_name = "histogram"
+    DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts (last slot is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._values.items()]
+        samples = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = _format_value(bound)
+                samples.append((f"{self.name}_bucket", _format_labels(self.labelnames, key, [("le", le)]), cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, key), total))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, key), count))
+        return samples
+
+def process_memory() -> dict:
+    """Resident and peak resident memory of this process in bytes (None where the OS doesn't say)."""
+    rss = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == "darwin" else 1024  # bytes on macOS, KiB on Linux
+    except ImportError:
+        pass  # Windows
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    return "\n".join(m.render() for m in REGISTRY) + "\n"
+
+# ============= APPLICATION METRICS =============
+
+# Jobs (fed from api.py)
+JOBS_QUEUED = Gauge("analysis_jobs_queued", "Accepted jobs waiting for a crew")
+JOBS_RUNNING = Gauge("analysis_jobs_running", "Jobs currently running a crew")
+JOBS_TOTAL = Counter("analysis_jobs_total", "Finished jobs by outcome", ["status"])
+JOB_SECONDS = Histogram("analysis_job_seconds", "End-to-end job latency", ["status"])
+STAGE_SECONDS = Histogram(
+    "analysis_stage_seconds",
+    "Time spent per stage (span category) in each job",
+    ["stage"],
+)
+CREW_POOL_AVAILABLE = Gauge("crew_pool_available", "Idle crews in the pool")
+JOBS_RETAINED = Gauge("analysis_jobs_retained", "Job records held in memory by status", ["status"])
+PROCESS_RESIDENT_BYTES = Gauge("process_resident_memory_bytes", "Resident memory of the API process")
+
+# Agent tool loop (fed from tool_loop.py and api.py)
+AGENT_ITERATIONS = Histogram(
+    "agent_iterations",
+    "LLM rounds per agent task",
+    ["agent"],
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15),
+)
+AGENT_EARLY_EXITS = Counter("agent_early_exits_total", "Agent loops stopped once required tools returned", ["agent"])
+TOOL_MEMO_HITS = Counter("tool_memo_hits_total", "Repeated tool calls answered from the run memo", ["tool"])
+
+# Data layer (fed from tools/financial_tools.py)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by data type and result (hit, stale, miss, negative)",
+    ["data_type", "result"],
+)
+NEWS_ARTICLES = Counter(
+    "news_articles_total",
+    "Articles in Finnhub news responses, by whether they were new or already stored (skipped)",
+    ["result"],
+)
+UPSTREAM_REQUESTS = Counter("upstream_requests_total", "HTTP calls to market-data providers", ["provider"])
+UPSTREAM_ERRORS = Counter(
+    "upstream_errors_total",
+    "Failed provider calls (exceptions and non-200 responses)",
+    ["provider"],
+)
+UPSTREAM_RATE_LIMITED = Counter("upstream_rate_limited_total", "HTTP 429 responses from providers", ["provider"])
+UPSTREAM_SECONDS = Histogram(
+    "upstream_request_seconds",
+    "Provider HTTP latency",
+    ["provider"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# LLM (fed from profiling.TracedLLM)
+LLM_REQUESTS = Counter("llm_requests_total", "LLM completion calls", ["model"])
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens by kind", ["model", "kind"])
+LLM_SECONDS = Histogram("llm_request_seconds", "LLM completion latency", ["model"])
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_completion_tokens_per_second",
+    "Completion tokens per second for each LLM call",
+    ["model"],
+    buckets=(1, 2, 5, 10, 20, 40, 80, 160),
+)
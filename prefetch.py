@@ -0,0 +1,139 @@
+# prefetch.py
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from config import WATCHLIST, PREFETCH_TIMES, MARKET_TIMEZONE
+from tools.financial_tools import (
+    cache_age_hours,
+    _fetch_av_overview,
+    _fetch_av_history,
+    _fetch_finnhub_history,
+    _fetch_finnhub_news,
+)
+
+# Overview entries live for a week; only refresh ones that would expire within this horizon
+OVERVIEW_VALIDITY_HOURS = 168
+REFRESH_HORIZON_HOURS = 24
+
+def _market_tz():
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(MARKET_TIMEZONE)
+    except Exception:
+        return None  # Fall back to local time (e.g. no tzdata in the image)
+
+def prefetch_symbol(symbol: str) -> dict:
+    """
+    Refresh the cached overview, price history and news for one symbol.
+    Returns which data types ended up fresh. Provider rate limits are
+    enforced by the shared limiters in `tools.financial_tools`.
+    """
+    symbol = symbol.upper()
+    results = {}
+
+    age = cache_age_hours(symbol, "av_overview")
+    if age is not None and age < OVERVIEW_VALIDITY_HOURS - REFRESH_HORIZON_HOURS:
+        results["overview"] = True
+    else:
+        results["overview"] = _fetch_av_overview(symbol, refresh=True) is not None
+
+    # Same order as _get_hybrid_history: Finnhub first, Alpha Vantage as fallback
+    hist = _fetch_finnhub_history(symbol, refresh=True)
+    if hist is None or hist.empty:
+        hist = _fetch_av_history(symbol, refresh=True)
+    results["history"] = hist is not None and not hist.empty
+
+    results["news"] = _fetch_finnhub_news(symbol, refresh=True) is not None
+    return results
+
+def prefetch_watchlist(symbols=None) -> dict:
+    """Warm the cache for every symbol in the watchlist."""
+    symbols = symbols if symbols is not None else WATCHLIST
+    summary = {}
+    for symbol in symbols:
+        try:
+            summary[symbol] = prefetch_symbol(symbol)
+        except Exception as e:
+            summary[symbol] = {"error": str(e)}
+        print(f"[prefetch] {symbol}: {summary[symbol]}")
+    return summary
+
+def next_run_time(now: datetime, times=None) -> datetime:
+    """Next weekday occurrence of any configured HH:MM after `now`."""
+    times = times if times is not None else PREFETCH_TIMES
+    slots = []
+    for t in times:
+        hour, minute = (int(part) for part in t.split(":"))
+        slots.append((hour, minute))
+    for day in range(8):
+        date = now + timedelta(days=day)
+        if date.weekday() >= 5:
+            continue
+        for hour, minute in sorted(slots):
+            candidate = date.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if candidate > now:
+                return candidate
+    raise ValueError("PREFETCH_TIMES is empty")
+
+class Prefetcher:
+    """Background thread that warms the watchlist cache on the configured schedule."""
+
+    def __init__(self, symbols=None, times=None):
+        self.symbols = symbols if symbols is not None else WATCHLIST
+        self.times = times if times is not None else PREFETCH_TIMES
+        self.last_run = None
+        self.next_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.symbols:
+            print("[prefetch] Watchlist is empty; prefetcher not started")
+            return self
+        self._thread = threading.Thread(target=self.run_forever, name="prefetcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def run_forever(self):
+        tz = _market_tz()
+        while not self._stop.is_set():
+            now = datetime.now(tz)
+            self.next_run = next_run_time(now, self.times)
+            print(f"[prefetch] Next run at {self.next_run.isoformat()} for {len(self.symbols)} symbols")
+            if self._stop.wait((self.next_run - now).total_seconds()):
+                break
+            prefetch_watchlist(self.symbols)
+            self.last_run = datetime.now(tz)
+
+def main():
+    """CLI entry point: warm the cache once, or keep running on the schedule."""
+    parser = argparse.ArgumentParser(description="Prefetch market data for a watchlist")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: WATCHLIST from .env)")
+    parser.add_argument("--once", action="store_true", help="Prefetch immediately and exit")
+    args = parser.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else WATCHLIST
+    if not symbols:
+        print("❌ No symbols to prefetch! Set WATCHLIST in .env or pass --symbols.")
+        sys.exit(1)
+
+    if args.once:
+        prefetch_watchlist(symbols)
+        return
+
+    prefetcher = Prefetcher(symbols)
+    try:
+        prefetcher.run_forever()
+    except KeyboardInterrupt:
+        prefetcher.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# profiling.py
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from crewai import LLM
+
+import metrics
+from cancellation import check_cancelled
+
+# Trace of the analysis running in the current thread/context (None = off)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+# Span args that are summed per category in Trace.summary()
+SUMMED_ARGS = ("bytes", "prompt_tokens", "completion_tokens", "total_tokens")
+
+class Trace:
+    """
+    Collects timing spans for one analysis run.
+
+    Each span is a plain dict: name, cat, start_ms (relative to the trace
+    start), duration_ms, tid and an args dict (symbol, bytes, tokens, ...).
+    """
+
+    def __init__(self, name: str = "analysis"):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._task_started = None
+
+    def add(self, record: dict):
+        with self._lock:
+            self.spans.append(record)
+
+    def add_span(self, name: str, category: str, start: float, end: float, **args):
+        """Record a span between two `time.perf_counter()` readings."""
+        self.add({
+            "name": name,
+            "cat": category,
+            "start_ms": (start - self.started) * 1000,
+            "duration_ms": (end - start) * 1000,
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def summary(self) -> dict:
+        """Per-category totals: span count, time and summed bytes/tokens."""
+        categories = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            cat = categories.setdefault(s["cat"], {"count": 0, "duration_ms": 0.0})
+            cat["count"] += 1
+            cat["duration_ms"] += s["duration_ms"]
+            for key in SUMMED_ARGS:
+                if key in s["args"]:
+                    cat[key] = cat.get(key, 0) + s["args"][key]
+        for cat in categories.values():
+            cat["duration_ms"] = round(cat["duration_ms"], 3)
+        return {
+            "wall_ms": round(self.elapsed_ms(), 3),
+            "categories": categories,
+        }
+
+    def to_chrome_trace(self) -> dict:
+        """Export as Chrome trace JSON (load in chrome://tracing or Perfetto)."""
+        with self._lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": s["name"],
+                "cat": s["cat"],
+                "ph": "X",
+                "ts": round(s["start_ms"] * 1000, 3),
+                "dur": round(s["duration_ms"] * 1000, 3),
+                "pid": 1,
+                "tid": s["tid"],
+                "args": s["args"],
+            }
+            for s in spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"name": self.name}}
+
+@contextmanager
+def activate(trace: Trace):
+    """Make `trace` the target of all spans recorded in this context."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+def current_trace():
+    return _current_trace.get()
+
+@contextmanager
+def span(name: str, category: str, **args):
+    """
+    Time a block and record it on the active trace.
+
+    Yields the span's args dict so the block can attach bytes, token counts
+    or flags. Without an active trace this is a no-op.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield args
+        return
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        trace.add_span(name, category, start, time.perf_counter(), **args)
+
+def traced(category: str, name: str = None):
+    """Decorator form of `span`; records the symbol when it is the first argument."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            symbol = args[0] if args and isinstance(args[0], str) else kwargs.get("symbol")
+            span_args = {"symbol": symbol} if symbol else {}
+            with span(span_name, category, **span_args):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# ============= CREW HOOKS =============
+
+def crew_started(inputs):
+    """`before_kickoff_callbacks` hook: marks the start of the first task."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace._task_started = time.perf_counter()
+    return inputs
+
+def task_finished(output):
+    """
+    `task_callback` hook: records a span for the task that just finished.
+
+    Tasks run sequentially, so each one starts where the previous one ended.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    end = time.perf_counter()
+    start = trace._task_started or trace.started
+    trace._task_started = end
+    trace.add({
+        "name": output.name or output.summary or "task",
+        "cat": "task",
+        "start_ms": (start - trace.started) * 1000,
+        "duration_ms": (end - start) * 1000,
+        "tid": threading.get_ident(),
+        "args": {"agent": output.agent, "bytes": len(output.raw or "")},
+    })
+
+class TracedLLM(LLM):
+    """
+    LLM that records a span (with token usage) for every completion call.
+    Each call is also a cancellation point for the job it runs in.
+    """
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        check_cancelled()
+        # The agent executor passes a TokenCalcHandler; diff its running totals
+        token_process = next(
+            (getattr(cb, "token_cost_process", None) for cb in callbacks or []
+             if getattr(cb, "token_cost_process", None) is not None),
+            None,
+        )
+        before = (token_process.prompt_tokens, token_process.completion_tokens) if token_process else (0, 0)
+        start = time.perf_counter()
+        with span(f"llm {self.model}", "llm") as s:
+            result = super().call(
+                messages,
+                tools=tools,
+                callbacks=callbacks,
+                available_functions=available_functions,
+            )
+            s["bytes"] = len(result) if isinstance(result, str) else 0
+            if token_process:
+                s["prompt_tokens"] = token_process.prompt_tokens - before[0]
+                s["completion_tokens"] = token_process.completion_tokens - before[1]
+                s["total_tokens"] = s["prompt_tokens"] + s["completion_tokens"]
+        elapsed = time.perf_counter() - start
+        metrics.LLM_REQUESTS.inc(model=self.model)
+        metrics.LLM_SECONDS.observe(elapsed, model=self.model)
+        if token_process:
+            metrics.LLM_TOKENS.inc(s["prompt_tokens"], model=self.model, kind="prompt")
+            metrics.LLM_TOKENS.inc(s["completion_tokens"], model=self.model, kind="completion")
+            if elapsed > 0:
+                metrics.LLM_TOKENS_PER_SECOND.observe(s["completion_tokens"] / elapsed, model=self.model)
+        # Don't hand a cancelled job's agent another step to act on
+        check_cancelled()
+        return result
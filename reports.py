@@ -0,0 +1,180 @@
+# reports.py
+"""
+Report archive: one compact JSON record per analysis in REPORTS_DIR, named
+`{SYMBOL}_{YYYYmmdd_HHMMSS}[-N].json[.gz|.zst]` (`-N` when several reports
+for a symbol land in the same second) and compressed with
+REPORT_COMPRESSION. The file name without suffix is the report id.
+Older uncompressed `.json` reports stay readable (`python reports.py --compress`
+rewrites them).
+"""
+import argparse
+import json
+import os
+import re
+from datetime import datetime
+
+from compression import SUFFIXES, available, compress, decompress
+from config import REPORTS_DIR, REPORT_COMPRESSION
+
+_REPORT_FILE = re.compile(r"^(?P<id>(?P<symbol>.+)_(?P<stamp>\d{8}_\d{6})(?:-\d+)?)\.json(?P<suffix>\.gz|\.zst)?$")
+_ENCODINGS = {suffix: encoding for encoding, suffix in SUFFIXES.items()}
+
+_warned = False
+
+def _storage_encoding():
+    """REPORT_COMPRESSION, falling back to gzip if zstd is unavailable; None for `none`."""
+    global _warned
+    if REPORT_COMPRESSION == "none":
+        return None
+    if available(REPORT_COMPRESSION):
+        return REPORT_COMPRESSION
+    if not _warned:
+        print(f"[reports] REPORT_COMPRESSION={REPORT_COMPRESSION} unavailable; using gzip")
+        _warned = True
+    return "gzip"
+
+def _write(path: str, record: dict, encoding):
+    data = json.dumps(record, separators=(",", ":")).encode("utf-8")
+    if encoding is not None:
+        data = compress(data, encoding)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _reserve(rid: str, suffix: str) -> str:
+    """
+    Claim the report path for `rid` (or `rid-2`, `rid-3`, ... if taken) by
+    creating its `.tmp` file, which listings skip and `_write` then fills
+    and renames into place; returns the report path.
+    """
+    n = 1
+    while True:
+        candidate = rid if n == 1 else f"{rid}-{n}"
+        path = os.path.join(REPORTS_DIR, f"{candidate}.json{suffix}")
+        if find_report(candidate) is None:
+            try:
+                open(f"{path}.tmp", "x").close()
+            except FileExistsError:
+                pass
+            else:
+                # Another writer may have finished this id before our claim
+                if find_report(candidate) is None:
+                    return path
+                os.remove(f"{path}.tmp")
+        n += 1
+
+def save_report(symbol: str, result, **extra) -> str:
+    """
+    Archive an analysis; returns the path.
+    `extra` fields are stored alongside (e.g. `partial=True` for a cut-off job).
+    """
+    symbol = symbol.upper()
+    encoding = _storage_encoding()
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    report_filename = _reserve(f"{symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}", SUFFIXES.get(encoding, ""))
+
+    _write(report_filename, {
+        "symbol": symbol,
+        "analysis_date": datetime.now().isoformat(),
+        "report": str(result),
+        **extra,
+    }, encoding)
+    return report_filename
+
+def save_partial_report(symbol: str, outputs: list, reason: str):
+    """Archive the finished task outputs of a cut-off job; None if no task finished."""
+    if not outputs:
+        return None
+    text = "\n\n".join(f"## {o['agent']}\n{o['output']}" for o in outputs)
+    return save_report(symbol, text, partial=True, cancel_reason=reason, tasks=outputs)
+
+def report_id(path: str):
+    """Id of a report file (`AAPL_20250101_093000`), or None for other files."""
+    match = _REPORT_FILE.match(os.path.basename(path))
+    return match.group("id") if match else None
+
+def parse_report_id(rid: str):
+    """`(symbol, created)` of a report id, or None if it isn't one."""
+    match = _REPORT_FILE.match(f"{rid}.json")
+    if match is None:
+        return None
+    return match.group("symbol"), datetime.strptime(match.group("stamp"), "%Y%m%d_%H%M%S")
+
+def report_files(reports_dir: str = REPORTS_DIR, symbol: str = None, since: datetime = None,
+                 until: datetime = None):
+    """
+    `(report_id, path)` per archived report, oldest first, filtered on the
+    symbol and timestamp in the file name (no file is opened).
+    """
+    try:
+        names = os.listdir(reports_dir)
+    except FileNotFoundError:
+        return
+    matches = sorted(
+        (m for m in map(_REPORT_FILE.match, names) if m is not None),  # Skips Chrome traces, temp files
+        key=lambda m: (m.group("stamp"), m.group("id")),
+    )
+    for match in matches:
+        if symbol and match.group("symbol") != symbol.upper():
+            continue
+        if since or until:
+            stamp = datetime.strptime(match.group("stamp"), "%Y%m%d_%H%M%S")
+            if (since and stamp < since) or (until and stamp > until):
+                continue
+        yield match.group("id"), os.path.join(reports_dir, match.string)
+
+def find_report(rid: str, reports_dir: str = REPORTS_DIR):
+    """Path of report `rid` in whichever form it is stored, or None."""
+    if os.path.basename(rid) != rid:
+        return None
+    for suffix in ("", *SUFFIXES.values()):
+        path = os.path.join(reports_dir, f"{rid}.json{suffix}")
+        if _REPORT_FILE.match(os.path.basename(path)) and os.path.exists(path):
+            return path
+    return None
+
+def stored_encoding(path: str):
+    """Codec of a report file from its suffix; None if uncompressed."""
+    return _ENCODINGS.get(os.path.splitext(path)[1])
+
+def read_raw(path: str):
+    """`(bytes, encoding)` of a report file as stored."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return data, stored_encoding(path)
+
+def load_report(path: str) -> dict:
+    data, encoding = read_raw(path)
+    return json.loads(decompress(data, encoding))
+
+def compress_archive(reports_dir: str = REPORTS_DIR, encoding: str = None) -> int:
+    """Rewrite uncompressed `.json` reports with `encoding` (default REPORT_COMPRESSION); returns the count."""
+    encoding = encoding or _storage_encoding()
+    if encoding is None:
+        return 0
+    count = 0
+    for rid, path in list(report_files(reports_dir)):
+        if not path.endswith(".json"):
+            continue
+        _write(f"{path}{SUFFIXES[encoding]}", load_report(path), encoding)
+        os.remove(path)
+        count += 1
+    return count
+
+def main():
+    """CLI entry point: compress reports archived before REPORT_COMPRESSION."""
+    parser = argparse.ArgumentParser(description="Maintain the report archive")
+    parser.add_argument("--compress", action="store_true", help="Compress uncompressed .json reports in place")
+    parser.add_argument("--encoding", choices=sorted(SUFFIXES), help="Codec (default: REPORT_COMPRESSION)")
+    parser.add_argument("--reports-dir", default=REPORTS_DIR)
+    args = parser.parse_args()
+
+    if args.compress:
+        count = compress_archive(args.reports_dir, args.encoding)
+        print(f"Compressed {count} report(s) in {args.reports_dir}")
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
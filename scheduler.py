@@ -0,0 +1,159 @@
+# scheduler.py
+"""
+In-process job scheduler with priority classes and per-client fair queuing.
+
+Jobs wait in a FIFO per (class, client). Whenever a crew is free, the
+dispatcher picks the class furthest below its share (JOB_CLASS_SHARES)
+among those with jobs waiting and under their crew cap (BATCH_MAX_CREWS),
+then the next client of that class round-robin, so one client's 200-symbol
+batch neither starves other clients nor fills every crew. Queued jobs hold
+no thread; only dispatched ones run, on `capacity` threads.
+"""
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import CREW_POOL_SIZE, JOB_CLASS_SHARES, BATCH_MAX_CREWS
+
+JOB_CLASSES = ("interactive", "batch")
+
+# Seconds between sweeps for queued jobs whose token was cancelled (deadlines)
+SWEEP_SECONDS = 1.0
+
+class Scheduler:
+    """Runs submitted jobs on `capacity` slots, choosing the next job by class share and client."""
+
+    def __init__(self, capacity: int = CREW_POOL_SIZE, shares: dict = None, limits: dict = None):
+        self.capacity = max(1, capacity)
+        shares = shares if shares is not None else JOB_CLASS_SHARES
+        self.shares = {c: max(float(shares.get(c, 1)), 1e-9) for c in JOB_CLASSES}
+        limits = limits if limits is not None else {"batch": BATCH_MAX_CREWS}
+        self.limits = {c: min(self.capacity, max(1, limits.get(c, self.capacity))) for c in JOB_CLASSES}
+        self.running = {c: 0 for c in JOB_CLASSES}
+        self._queues = {c: OrderedDict() for c in JOB_CLASSES}  # client -> deque of jobs, in round-robin order
+        self._jobs = {}  # job id -> queued job
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(self.capacity, thread_name_prefix="crew")
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, job_id: str, run, job_class: str = "interactive", client: str = "anonymous",
+               token=None, on_cancel=None):
+        """
+        Queue `run()` for execution. If `token` is cancelled (or passes its
+        deadline) while the job is still queued, it is dropped and
+        `on_cancel(reason)` is called instead.
+        """
+        if job_class not in self.running:
+            raise ValueError(f"Unknown job class: {job_class}")
+        job = {"id": job_id, "run": run, "class": job_class, "client": client,
+               "token": token, "on_cancel": on_cancel}
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch_loop, name="scheduler", daemon=True)
+                self._thread.start()
+            self._queues[job_class].setdefault(client, deque()).append(job)
+            self._jobs[job_id] = job
+            self._cond.notify_all()
+
+    def cancel(self, job_id: str, reason: str = "cancelled") -> bool:
+        """Drop a queued job (calling its `on_cancel`); False if it is not queued."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            self._remove(job)
+        self._cancelled(job, reason)
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                job_class: {
+                    "queued": sum(len(q) for q in self._queues[job_class].values()),
+                    "running": self.running[job_class],
+                    "clients": len(self._queues[job_class]),
+                    "max_crews": self.limits[job_class],
+                }
+                for job_class in JOB_CLASSES
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._executor.shutdown(wait=wait)
+
+    def _remove(self, job):
+        del self._jobs[job["id"]]
+        clients = self._queues[job["class"]]
+        clients[job["client"]].remove(job)
+        if not clients[job["client"]]:
+            del clients[job["client"]]
+
+    def _next_class(self):
+        """Class furthest below its share among those with jobs waiting and crews left under their cap."""
+        candidates = [
+            c for c in JOB_CLASSES
+            if self._queues[c] and self.running[c] < self.limits[c]
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda c: (self.running[c] / self.shares[c], -self.shares[c]))
+
+    def _pop(self, job_class: str):
+        """Head job of the next client in round-robin order; that client moves to the back."""
+        clients = self._queues[job_class]
+        client, jobs = next(iter(clients.items()))
+        job = jobs.popleft()
+        if jobs:
+            clients.move_to_end(client)
+        else:
+            del clients[client]
+        del self._jobs[job["id"]]
+        return job
+
+    def _expired(self) -> list:
+        expired = [j for j in self._jobs.values() if j["token"] is not None and j["token"].cancelled]
+        for job in expired:
+            self._remove(job)
+        return expired
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                expired = self._expired()
+                dispatched = []
+                while sum(self.running.values()) < self.capacity:
+                    job_class = self._next_class()
+                    if job_class is None:
+                        break
+                    job = self._pop(job_class)
+                    self.running[job_class] += 1
+                    dispatched.append(job)
+                if not expired and not dispatched:
+                    self._cond.wait(SWEEP_SECONDS)
+            for job in expired:
+                self._cancelled(job, job["token"].reason)
+            for job in dispatched:
+                self._executor.submit(self._run, job)
+
+    def _cancelled(self, job, reason: str):
+        if job["on_cancel"] is None:
+            return
+        try:
+            job["on_cancel"](reason)
+        except Exception as e:
+            print(f"[scheduler] Cancel handler for {job['id']} raised: {e}")
+
+    def _run(self, job):
+        try:
+            job["run"]()
+        except Exception as e:
+            print(f"[scheduler] Job {job['id']} raised: {e}")
+        finally:
+            with self._cond:
+                self.running[job["class"]] -= 1
+                self._cond.notify_all()
@@ -7,12 +7,26 @@ from agents import (
     portfolio_manager
 )
 
-def create_tasks(stock_symbol: str):
-    """Create tasks for analyzing a stock"""
+# Tools whose results a task needs. Once an agent has them all, its next step
+# is the final answer (see tool_loop.py). The portfolio manager's loop ends
+# with `format_report`, whose output is its answer.
+REQUIRED_TOOLS = {
+    market_researcher.role: ("fetch_market_summary",),
+    technical_analyst.role: ("calculate_moving_averages", "calculate_rsi", "calculate_support_resistance"),
+    fundamental_analyst.role: ("fetch_fundamentals",),
+}
+
+def create_tasks():
+    """
+    Create templated tasks for analyzing a stock.
+
+    Descriptions use the `{stock_symbol}` placeholder, which CrewAI fills in
+    from `crew.kickoff(inputs=...)`, so the same tasks serve every symbol.
+    """
     
     # Task 1: Market Research
     market_research_task = Task(
-        description=f"""
+        description="""
         Analyze the market sentiment and current status of {stock_symbol}.
         
         Research and provide:
@@ -24,7 +38,7 @@ def create_tasks(stock_symbol: str):
         
         Be thorough and cite specific data points.
         """,
-        expected_output=f"""
+        expected_output="""
         Comprehensive market analysis for {stock_symbol} including:
         - Recent news summary (top 3-5 articles)
         - Company business description
@@ -38,7 +52,7 @@ def create_tasks(stock_symbol: str):
     
     # Task 2: Technical Analysis
     technical_analysis_task = Task(
-        description=f"""
+        description="""
         Perform comprehensive technical analysis on {stock_symbol}.
         
         Analyze and provide:
@@ -51,7 +65,7 @@ def create_tasks(stock_symbol: str):
         
         Identify clear buy, sell, or hold signals.
         """,
-        expected_output=f"""
+        expected_output="""
         Detailed technical analysis for {stock_symbol}:
         - Current trend direction and strength
         - Key support and resistance levels
@@ -67,7 +81,7 @@ def create_tasks(stock_symbol: str):
     
     # Task 3: Fundamental Analysis
     fundamental_analysis_task = Task(
-        description=f"""
+        description="""
         Conduct deep fundamental analysis of {stock_symbol}.
         
         Analyze and evaluate:
@@ -81,7 +95,7 @@ def create_tasks(stock_symbol: str):
         
         Assess if the company is undervalued or overvalued.
         """,
-        expected_output=f"""
+        expected_output="""
         Comprehensive fundamental analysis for {stock_symbol}:
         - Valuation assessment (undervalued/fair/overvalued)
         - Key financial metrics and their trends
@@ -98,7 +112,7 @@ def create_tasks(stock_symbol: str):
     
     # Task 4: Portfolio Manager Synthesis
     synthesis_task = Task(
-        description=f"""
+        description="""
         You are the Senior Portfolio Manager. Synthesize all research from your three analysts
         about {stock_symbol} into a single, clear investment recommendation.
         
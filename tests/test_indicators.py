@@ -0,0 +1,60 @@
+# tests/test_indicators.py
+import numpy as np
+import pandas as pd
+
+from tools import indicators
+
+def _batch(series):
+    offsets = np.zeros(len(series) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in series], out=offsets[1:])
+    return np.concatenate(series), offsets
+
+def _prices(seed, n):
+    return 100 + np.cumsum(np.random.default_rng(seed).normal(0, 1, n))
+
+def test_nan_close_stays_in_its_own_symbol():
+    first = _prices(0, 60)
+    first[45] = np.nan
+    others = [_prices(1, 80), _prices(2, 30)]
+    close, offsets = _batch([first] + others)
+
+    ma20 = indicators.moving_average_last(close, offsets, 20)
+    rsi = indicators.rsi_last(close, offsets, 14)
+    rolling = indicators.rolling_mean(close, offsets, 20)
+
+    # The NaN is inside the first symbol's last 20 bars, as pandas would report
+    assert np.isnan(ma20[0])
+    for i, series in enumerate(others, start=1):
+        expected = pd.Series(series).rolling(20).mean()
+        assert np.isclose(ma20[i], expected.iloc[-1])
+        np.testing.assert_allclose(rolling[offsets[i]:offsets[i + 1]], expected.to_numpy())
+        delta = pd.Series(series).diff()
+        gain = delta.where(delta > 0, 0).rolling(14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+        assert np.isclose(rsi[i], (100 - 100 / (1 + gain / loss)).iloc[-1])
+
+    # Windows of the first symbol that don't contain the NaN are unaffected
+    expected = pd.Series(first).rolling(20).mean().to_numpy()
+    np.testing.assert_allclose(rolling[:len(first)], expected)
+
+def test_batch_matches_single_symbol_results():
+    series = [_prices(seed, n) for seed, n in ((3, 250), (4, 19), (5, 120))]
+    close, offsets = _batch(series)
+    for window in (20, 50, 200):
+        batch = indicators.moving_average_last(close, offsets, window)
+        single = [indicators.moving_average_last(s, indicators.single(s), window)[0] for s in series]
+        np.testing.assert_allclose(batch, single)
+
+def test_support_resistance_skips_nan_bars():
+    series = [_prices(seed, n) for seed, n in ((6, 120), (7, 95))]
+    high = [s + 1 for s in series]
+    low = [s - 1 for s in series]
+    high[0][-10] = np.nan
+    low[0][-20] = np.nan
+    high_flat, offsets = _batch(high)
+    low_flat, _ = _batch(low)
+
+    support, resistance = indicators.support_resistance(high_flat, low_flat, offsets, 90)
+    for i in range(len(series)):
+        assert np.isclose(support[i], pd.Series(low[i]).tail(90).min())
+        assert np.isclose(resistance[i], pd.Series(high[i]).tail(90).max())
@@ -0,0 +1,168 @@
+# tool_loop.py
+"""
+Controls on the agents' tool loop for one crew run.
+
+- ToolMemo: the run's tool-result memo, shared by all agents. A call with the
+  same tool and arguments (after filling defaults and normalizing the symbol)
+  is answered from it instead of running the tool again, including
+  back-to-back repeats that CrewAI would otherwise refuse with a "reusing the
+  same input" error, costing the agent another round.
+- Early exit: once an agent has results from every tool its task requires
+  (REQUIRED_TOOLS in tasks.py), its next LLM call asks for the final answer.
+- agent_loop_stats: per-agent iterations, tool calls, memo hits and early exits.
+"""
+import inspect
+import json
+from functools import partial
+
+from crewai.agents.cache import CacheHandler
+from crewai.agents.tools_handler import ToolsHandler
+from pydantic import PrivateAttr, create_model
+
+import metrics
+from config import AGENT_EARLY_EXIT
+
+REPEAT_NOTE = "\n\n(Same call already made in this analysis; reusing its result. Do not call it again.)"
+
+def _signature_defaults(tool) -> dict:
+    """Optional arguments of a function tool and their defaults."""
+    func = getattr(tool, "func", None)
+    if func is None:
+        return {}
+    return {
+        name: param.default
+        for name, param in inspect.signature(func).parameters.items()
+        if param.default is not inspect.Parameter.empty
+    }
+
+def _tool_defaults(agents) -> dict:
+    defaults = {}
+    for agent in agents:
+        for tool in agent.tools or []:
+            defaults.setdefault(tool.name, _signature_defaults(tool))
+    return defaults
+
+def relax_tool_schemas(tools):
+    """
+    Give function tools' argument schemas the functions' defaults. CrewAI's
+    `@tool` marks every argument required, so a model omitting e.g. `period`
+    gets a validation error and spends another round retrying.
+    """
+    for tool in tools:
+        defaults = _signature_defaults(tool)
+        schema = getattr(tool, "args_schema", None)
+        if not defaults or schema is None:
+            continue
+        fields = {
+            name: (field.annotation, defaults.get(name, ...))
+            for name, field in schema.model_fields.items()
+        }
+        tool.args_schema = create_model(schema.__name__, **fields)
+
+class ToolMemo(CacheHandler):
+    """Tool results of one crew run, keyed on tool name and normalized arguments."""
+
+    _results: dict = PrivateAttr(default_factory=dict)
+    _defaults: dict = PrivateAttr(default_factory=dict)
+
+    def __init__(self, agents=(), **data):
+        super().__init__(**data)
+        self._defaults = _tool_defaults(agents)
+
+    def _key(self, tool: str, input) -> str:
+        if not isinstance(input, dict):
+            return f"{tool}:{input}"
+        defaults = self._defaults.get(tool, {})
+        args = {**defaults, **{k: v for k, v in input.items() if v is not None}}
+        if isinstance(args.get("symbol"), str):
+            args["symbol"] = args["symbol"].strip().upper()
+        return f"{tool}:{json.dumps(args, sort_keys=True, default=str)}"
+
+    def add(self, tool, input, output):
+        self._results[self._key(tool, input)] = output
+
+    def read(self, tool, input):
+        return self._results.get(self._key(tool, input))
+
+class _AgentMemo:
+    """One agent's view of the run memo; counts the agent's hits."""
+
+    def __init__(self, memo: ToolMemo):
+        self.memo = memo
+        self.hits = 0
+
+    def add(self, tool, input, output):
+        self.memo.add(tool, input, output)
+
+    def read(self, tool, input):
+        output = self.memo.read(tool, input)
+        if output is None:
+            return None
+        self.hits += 1
+        metrics.TOOL_MEMO_HITS.inc(tool=tool)
+        return f"{output}{REPEAT_NOTE}"
+
+class AgentToolsHandler(ToolsHandler):
+    """
+    ToolsHandler backed by the run memo. It never reports a last-used tool, so
+    CrewAI's repeated-call refusal doesn't fire and repeats hit the memo instead.
+    """
+
+    def __init__(self, memo: ToolMemo):
+        super().__init__(cache=_AgentMemo(memo))
+        self.early_exit = False
+
+    @property
+    def last_used_tool(self):
+        return {}
+
+    @last_used_tool.setter
+    def last_used_tool(self, value):
+        pass
+
+def on_agent_step(agent, required, step):
+    """
+    `step_callback` for one agent: once every `required` tool has returned,
+    cap the executor's iterations so its next LLM call is the forced final answer.
+    """
+    executor = agent.agent_executor
+    handler = agent.tools_handler
+    if not AGENT_EARLY_EXIT or not required or executor is None or handler.early_exit:
+        return
+    used = {result["tool_name"] for result in agent.tools_results or []}
+    if set(required) <= used and executor.max_iter > executor.iterations + 1:
+        executor.max_iter = executor.iterations + 1
+        handler.early_exit = True
+        metrics.AGENT_EARLY_EXITS.inc(agent=agent.role)
+
+def reset_tool_loop(crew, required_tools: dict) -> ToolMemo:
+    """
+    Fresh memo, tool handlers and step callbacks for a crew's next run.
+    `required_tools` maps agent roles to the tools their task needs.
+    """
+    memo = ToolMemo(crew.agents)
+    crew._cache_handler = memo
+    for agent in crew.agents:
+        agent.cache_handler = memo
+        agent.tools_handler = AgentToolsHandler(memo)
+        # Also read back for `result_as_answer` tools, so must not carry over runs
+        agent.tools_results = []
+        agent.step_callback = partial(on_agent_step, agent, required_tools.get(agent.role))
+    return memo
+
+def agent_loop_stats(crew) -> dict:
+    """Per-agent loop counts for the crew's current run (agents that ran a task only)."""
+    stats = {}
+    for agent in crew.agents:
+        executor = agent.agent_executor
+        if executor is None or executor.iterations == 0:
+            continue
+        handler = agent.tools_handler
+        stats[agent.role] = {
+            "iterations": executor.iterations,
+            "max_iter": agent.max_iter,
+            "tool_calls": len(agent.tools_results or []),
+            "memo_hits": handler.cache.hits if isinstance(handler, AgentToolsHandler) else 0,
+            "early_exit": getattr(handler, "early_exit", False),
+        }
+    return stats
@@ -1,9 +1,11 @@
 # tools/analysis_tools.py
 from crewai.tools import tool
+from profiling import traced
 import json
 from datetime import datetime
 
 @tool("calculate_valuation_metrics")
+@traced("tool")
 def calculate_valuation_metrics(pe_ratio: str, pb_ratio: str, eps: str) -> str:
     """
     Calculate and interpret valuation metrics.
@@ -26,6 +28,7 @@ def calculate_valuation_metrics(pe_ratio: str, pb_ratio: str, eps: str) -> str:
         return f"Error analyzing valuation: {str(e)}"
 
 @tool("assess_financial_health")
+@traced("tool")
 def assess_financial_health(debt: str, cash: str, revenue: str, net_income: str) -> str:
     """
     Assess company financial health.
@@ -53,6 +56,7 @@ def assess_financial_health(debt: str, cash: str, revenue: str, net_income: str)
         return f"Error assessing financial health: {str(e)}"
 
 @tool("generate_analysis_summary")
+@traced("tool")
 def generate_analysis_summary(technical: str, fundamental: str, sentiment: str) -> str:
     """
     Generate comprehensive analysis summary.
@@ -81,6 +85,7 @@ Technical + Fundamental + Sentiment = Investment Decision
         return f"Error generating summary: {str(e)}"
 
 @tool("format_report")
+@traced("tool")
 def format_report(symbol: str = "UNKNOWN", recommendation: str = "HOLD", price_target: str = "N/A", confidence: str = "N/A", current_price: str = "N/A", rsi: str = "N/A", pe_ratio: str = "N/A") -> str:
     """
     Format final investment report.
@@ -125,3 +130,7 @@ Confidence: {confidence}%
         return report
     except Exception as e:
         return f"Error formatting report: {str(e)}"
+
+# The portfolio manager's final answer is this tool's output verbatim, so
+# the agent's loop ends as soon as it returns (no extra LLM round trip)
+format_report.result_as_answer = True
@@ -0,0 +1,214 @@
+# tools/compute_pool.py
+"""
+Process-pool backend for indicator math over large symbol universes
+(screening, backtesting).
+
+Prices are packed once into a shared-memory block; worker processes attach
+to it by name and compute a contiguous range of symbols with the
+vectorized kernels in `tools.indicators`, so no price data is pickled and
+the work runs outside the API process's GIL. Each worker sends back a
+compact float64 table (one row per symbol, columns `indicators.FIELDS`).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import COMPUTE_WORKERS, COMPUTE_CHUNK_SYMBOLS
+from tools import indicators
+
+# Rows of the shared block
+CLOSE, HIGH, LOW = 0, 1, 2
+
+class PriceBlock:
+    """
+    Close/High/Low series for many symbols in one shared-memory segment,
+    laid out as a (3, total_bars) float64 array with per-symbol `offsets`.
+    The creating process owns the segment; call close() (or use `with`) to free it.
+    """
+
+    def __init__(self, symbols, closes, highs, lows):
+        self.symbols = list(symbols)
+        lengths = [len(c) for c in closes]
+        self.offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.total = int(self.offsets[-1])
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, 3 * self.total * 8))
+        if self.total:
+            data = self._view()
+            data[CLOSE] = np.concatenate(closes)
+            data[HIGH] = np.concatenate(highs)
+            data[LOW] = np.concatenate(lows)
+            del data  # release the buffer export so close() can succeed
+
+    @classmethod
+    def from_histories(cls, histories: dict) -> "PriceBlock":
+        """Build from `{symbol: DataFrame}` with High/Low/Close columns; empty histories are skipped."""
+        items = [(s, h) for s, h in histories.items() if h is not None and not h.empty]
+        return cls(
+            [s for s, _ in items],
+            [h['Close'].to_numpy(dtype=np.float64) for _, h in items],
+            [h['High'].to_numpy(dtype=np.float64) for _, h in items],
+            [h['Low'].to_numpy(dtype=np.float64) for _, h in items],
+        )
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def _view(self) -> np.ndarray:
+        return np.ndarray((3, self.total), dtype=np.float64, buffer=self._shm.buf)
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _compute_range(buf, total, offsets, rsi_period, sr_window) -> np.ndarray:
+    data = np.ndarray((3, total), dtype=np.float64, buffer=buf)
+    lo, hi = int(offsets[0]), int(offsets[-1])
+    # Rebase so the kernels only touch this range of the block
+    local = offsets - lo
+    return indicators.indicator_table(
+        data[CLOSE, lo:hi], data[HIGH, lo:hi], data[LOW, lo:hi], local, rsi_period, sr_window,
+    )
+
+def _compute_chunk(shm_name, total, offsets, rsi_period, sr_window) -> np.ndarray:
+    """Worker entry point: attach to the block, compute one range of symbols, detach."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return _compute_range(shm.buf, total, offsets, rsi_period, sr_window)
+    finally:
+        shm.close()
+
+class IndicatorPool:
+    """
+    Lazily started pool of worker processes. Blocks smaller than one chunk
+    (or a pool with a single worker) are computed in-process.
+    """
+
+    def __init__(self, workers: int = COMPUTE_WORKERS, chunk_symbols: int = COMPUTE_CHUNK_SYMBOLS):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_symbols = max(1, chunk_symbols)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking the threaded API process is not safe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def compute(self, block: PriceBlock, rsi_period: int = 14, sr_window: int = 90) -> np.ndarray:
+        """Indicator table for every symbol in `block`, rows in `block.symbols` order."""
+        n = len(block.symbols)
+        if n == 0:
+            return np.empty((0, len(indicators.FIELDS)))
+        if self.workers <= 1 or n <= self.chunk_symbols:
+            return _compute_range(block._shm.buf, block.total, block.offsets, rsi_period, sr_window)
+
+        executor = self._get_executor()
+        futures = [
+            executor.submit(
+                _compute_chunk, block.name, block.total,
+                block.offsets[start:start + self.chunk_symbols + 1], rsi_period, sr_window,
+            )
+            for start in range(0, n, self.chunk_symbols)
+        ]
+        return np.vstack([f.result() for f in futures])
+
+    def compute_histories(self, histories: dict, **kwargs) -> dict:
+        """`{symbol: DataFrame}` -> `{symbol: {field: value}}`."""
+        with PriceBlock.from_histories(histories) as block:
+            table = self.compute(block, **kwargs)
+            return to_records(block.symbols, table)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+def to_records(symbols, table: np.ndarray) -> dict:
+    """Indicator table rows as `{symbol: {field: value}}` (NaN becomes None)."""
+    return {
+        symbol: {f: (None if np.isnan(v) else float(v)) for f, v in zip(indicators.FIELDS, row)}
+        for symbol, row in zip(symbols, table)
+    }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> IndicatorPool:
+    """Process-wide IndicatorPool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = IndicatorPool()
+        return _pool
+
+def screen(symbols, days: int = 400, pool: IndicatorPool = None, resolution: str = "D") -> dict:
+    """
+    Load (cached) histories for `symbols` and compute their indicators on the pool.
+    With an intraday `resolution` ("1" ... "60"), `days` is the number of bars.
+    """
+    # Imported here so worker processes don't pull in CrewAI
+    from concurrent.futures import ThreadPoolExecutor
+    from tools.financial_tools import _get_bars
+
+    symbols = [s.upper() for s in symbols]
+    with ThreadPoolExecutor(max_workers=8) as loader:
+        histories = dict(zip(symbols, loader.map(lambda s: _get_bars(s, resolution, days), symbols)))
+    return (pool or get_pool()).compute_histories(histories)
+
+def _format(value, digits=2):
+    return "N/A" if value is None else f"{value:.{digits}f}"
+
+def main():
+    """CLI entry point: indicator table for a list of symbols (default: WATCHLIST)."""
+    from config import WATCHLIST
+
+    parser = argparse.ArgumentParser(description="Screen symbols on the indicator process pool")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: WATCHLIST from .env)")
+    parser.add_argument("--resolution", default="D", help="D (daily) or 1, 5, 15, 30, 60 (minute bars)")
+    parser.add_argument("--bars", type=int, default=400, help="Days of daily history, or intraday bars")
+    parser.add_argument("--sort", choices=indicators.FIELDS, default="rsi", help="Column to sort by")
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else WATCHLIST
+    if not symbols:
+        print("❌ No symbols! Pass --symbols or set WATCHLIST in .env.")
+        return
+    try:
+        results = screen(symbols, args.bars, resolution=args.resolution)
+    finally:
+        get_pool().shutdown()
+
+    missing = [s for s in symbols if s not in results]
+    rows = sorted(results.items(), key=lambda item: (item[1][args.sort] is None, item[1][args.sort] or 0))
+    print(f"{'Symbol':<8}" + "".join(f"{field:>12}" for field in indicators.FIELDS))
+    for symbol, row in rows:
+        print(f"{symbol:<8}" + "".join(f"{_format(row[field]):>12}" for field in indicators.FIELDS))
+    if missing:
+        print(f"No data for: {', '.join(missing)}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"resolution": args.resolution, "symbols": results, "missing": missing}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
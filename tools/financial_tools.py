@@ -3,12 +3,53 @@ import requests
 import json
 import os
 import pickle
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from crewai.tools import tool
 
-from config import ALPHA_VANTAGE_API_KEY, FINNHUB_API_KEY, CACHE_DIR
+from config import (
+    ALPHA_VANTAGE_API_KEY,
+    ALPHA_VANTAGE_BASE_URL,
+    FINNHUB_API_KEY,
+    FINNHUB_BASE_URL,
+    FINNHUB_RPM,
+    ALPHA_VANTAGE_RPM,
+    NEWS_CACHE_HOURS,
+    NEWS_TOP_N,
+    INTRADAY_BASE_RESOLUTION,
+    INTRADAY_HISTORY_DAYS,
+    INTRADAY_MAX_BARS,
+    INTRADAY_CACHE_MINUTES,
+    NEGATIVE_CACHE_NOT_FOUND_SECONDS,
+    NEGATIVE_CACHE_ERROR_SECONDS,
+    CACHE_DIR
+)
+from tools.rate_limit import RateLimiter
+from tools import indicators, intraday, news_store
+from tools.fundamentals_index import get_index, format_comparison
+from profiling import span, traced
+from cancellation import current_token
+import metrics
 import time
+import numpy as np
 import pandas as pd
+from urllib.parse import urlparse
+
+# Provider label for upstream metrics, keyed by API host
+PROVIDERS = {
+    urlparse(FINNHUB_BASE_URL).netloc: "finnhub",
+    urlparse(ALPHA_VANTAGE_BASE_URL).netloc: "alphavantage",
+}
+
+# Shared per-provider request budgets (interactive tools and prefetcher alike)
+RATE_LIMITERS = {
+    "finnhub": RateLimiter(FINNHUB_RPM),
+    "alphavantage": RateLimiter(ALPHA_VANTAGE_RPM),
+}
+
+# Largest history window the tools request (calendar days)
+HISTORY_WINDOW_DAYS = 400
 
 # Create Cache Dir if not exists
 if not os.path.exists(CACHE_DIR):
@@ -17,17 +58,24 @@ if not os.path.exists(CACHE_DIR):
 def get_cache_path(symbol, data_type):
     return os.path.join(CACHE_DIR, f"{symbol}_{data_type}.pkl")
 
-def load_cache(symbol, data_type, validity_hours=24):
+def _read_cache(symbol, data_type):
+    """Return (data, age_hours, size_bytes) for a cache entry of any age, or (None, None, 0)"""
     try:
         path = get_cache_path(symbol, data_type)
         if os.path.exists(path):
-            modified_time = datetime.fromtimestamp(os.path.getmtime(path))
-            if datetime.now() - modified_time < timedelta(hours=validity_hours):
-                with open(path, 'rb') as f:
-                    return pickle.load(f)
+            age = (time.time() - os.path.getmtime(path)) / 3600
+            with open(path, 'rb') as f:
+                return pickle.load(f), age, os.path.getsize(path)
     except Exception:
         pass
-    return None
+    return None, None, 0
+
+def cache_age_hours(symbol, data_type):
+    """Age of a cache entry in hours, or None if it does not exist"""
+    path = get_cache_path(symbol, data_type)
+    if not os.path.exists(path):
+        return None
+    return (time.time() - os.path.getmtime(path)) / 3600
 
 def save_cache(symbol, data_type, data):
     try:
@@ -37,19 +85,171 @@ def save_cache(symbol, data_type, data):
     except Exception:
         pass
 
+# ============= NEGATIVE CACHE & STALE-WHILE-REVALIDATE =============
+
+class SymbolNotFound(Exception):
+    """The provider answered, but has no data for the symbol."""
+
+# (symbol, data_type) -> (expires_at, reason); in-memory and short-lived
+_negative_cache = {}
+_negative_lock = threading.Lock()
+
+def _negative_cached(symbol, data_type):
+    """Reason for a remembered recent failure, or None"""
+    key = (symbol, data_type)
+    with _negative_lock:
+        entry = _negative_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del _negative_cache[key]
+            return None
+        return entry[1]
+
+def _remember_failure(symbol, data_type, not_found):
+    ttl = NEGATIVE_CACHE_NOT_FOUND_SECONDS if not_found else NEGATIVE_CACHE_ERROR_SECONDS
+    if ttl <= 0:
+        return
+    reason = "not_found" if not_found else "error"
+    with _negative_lock:
+        _negative_cache[(symbol, data_type)] = (time.monotonic() + ttl, reason)
+
+def _forget_failure(symbol, data_type):
+    with _negative_lock:
+        _negative_cache.pop((symbol, data_type), None)
+
+def _fetch_and_store(symbol, data_type, fetch):
+    """Run `fetch`, cache its result on success and remember failures"""
+    try:
+        data = fetch()
+    except SymbolNotFound:
+        _remember_failure(symbol, data_type, not_found=True)
+        return None
+    if data is None:
+        _remember_failure(symbol, data_type, not_found=False)
+        return None
+    save_cache(symbol, data_type, data)
+    _forget_failure(symbol, data_type)
+    return data
+
+# Background revalidation of stale entries, at most one in flight per key
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def _refresh_in_background(symbol, data_type, fetch):
+    key = (symbol, data_type)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            _fetch_and_store(symbol, data_type, fetch)
+        except Exception:
+            _remember_failure(symbol, data_type, not_found=False)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresh_pool.submit(run)
+
+def _cached_fetch(symbol, data_type, fetch, validity_hours=24, refresh=False):
+    """
+    Cache lookup with stale-while-revalidate and negative caching.
+
+    Fresh entries are returned directly. Expired entries are still returned
+    immediately while `fetch` refreshes them in the background. Without any
+    entry, `fetch` runs inline; it returns the data, None on error, or raises
+    SymbolNotFound, and failures are remembered briefly so repeated calls
+    don't re-hit the provider. `refresh=True` always fetches inline.
+    """
+    if not refresh:
+        with span(f"cache {data_type}", "cache", symbol=symbol, hit=False) as s:
+            data, age, size = _read_cache(symbol, data_type)
+            if data is not None:
+                s["hit"] = True
+                s["bytes"] = size
+                s["stale"] = age >= validity_hours
+        if data is not None and age < validity_hours:
+            metrics.CACHE_REQUESTS.inc(data_type=data_type, result="hit")
+            return data
+        if data is not None:
+            metrics.CACHE_REQUESTS.inc(data_type=data_type, result="stale")
+            if not _negative_cached(symbol, data_type):
+                _refresh_in_background(symbol, data_type, fetch)
+            return data
+        if _negative_cached(symbol, data_type):
+            metrics.CACHE_REQUESTS.inc(data_type=data_type, result="negative")
+            return None
+        metrics.CACHE_REQUESTS.inc(data_type=data_type, result="miss")
+    return _fetch_and_store(symbol, data_type, fetch)
+
+def _sleep(seconds):
+    """Wait (retry backoff, rate limits); in a job, wakes up and raises JobCancelled on cancellation or deadline"""
+    token = current_token()
+    if token is not None:
+        token.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+# Threads that carry HTTP calls for jobs with a cancel token
+_http_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="http")
+
+def _http_get(url, **kwargs):
+    """requests.get wrapper that records an HTTP span and provider metrics"""
+    parsed = urlparse(url)
+    provider = PROVIDERS.get(parsed.netloc, parsed.netloc)
+    limiter = RATE_LIMITERS.get(provider)
+    token = current_token()
+    if token is not None:
+        token.check()
+        kwargs["timeout"] = token.bound_timeout(kwargs.get("timeout"))
+    if limiter:
+        with span(f"rate limit {provider}", "queue"):
+            limiter.acquire(sleep=_sleep)
+    metrics.UPSTREAM_REQUESTS.inc(provider=provider)
+    start = time.perf_counter()
+    with span(f"GET {parsed.netloc}{parsed.path}", "http", provider=provider) as s:
+        try:
+            if token is None:
+                r = requests.get(url, **kwargs)
+            else:
+                # Run the request aside so a cancelled job stops waiting on it at once;
+                # the abandoned call ends on its own (timeout-bounded)
+                r = token.wait_for(_http_pool.submit(requests.get, url, **kwargs))
+        except Exception:
+            metrics.UPSTREAM_ERRORS.inc(provider=provider)
+            raise
+        finally:
+            metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, provider=provider)
+        s["status"] = r.status_code
+        s["bytes"] = len(r.content)
+    if r.status_code == 429:
+        metrics.UPSTREAM_RATE_LIMITED.inc(provider=provider)
+    if r.status_code != 200:
+        metrics.UPSTREAM_ERRORS.inc(provider=provider)
+    return r
+
 # ============= CORE LOGIC FUNCTIONS (Non-Tools) =============
 
+@traced("fetch")
 def _fetch_finnhub_price(symbol):
     """Fetch real-time quote from Finnhub"""
     if not FINNHUB_API_KEY: return None
+    # Quotes are never cached, but unknown symbols and failures are remembered
+    if _negative_cached(symbol, "quote"): return None
     headers = {'User-Agent': 'Mozilla/5.0'}
     for i in range(3):
         try:
-            url = f"https://finnhub.io/api/v1/quote?symbol={symbol}&token={FINNHUB_API_KEY}"
-            r = requests.get(url, headers=headers, timeout=10)
+            url = f"{FINNHUB_BASE_URL}/quote?symbol={symbol}&token={FINNHUB_API_KEY}"
+            r = _http_get(url, headers=headers, timeout=10)
             if r.status_code == 200:
                 data = r.json()
-                if data.get('c', 0) == 0 and data.get('pc', 0) == 0: return None
+                if data.get('c', 0) == 0 and data.get('pc', 0) == 0:
+                    _remember_failure(symbol, "quote", not_found=True)
+                    return None
                 return {
                     'currentPrice': data['c'],
                     'previousClose': data['pc'],
@@ -59,96 +259,178 @@ def _fetch_finnhub_price(symbol):
                     'change': data['d'],
                     'changePercent': data['dp']
                 }
-            if r.status_code == 429: time.sleep(2)
+            if r.status_code == 429: _sleep(2)
         except Exception:
-            time.sleep(1)
+            _sleep(1)
+    _remember_failure(symbol, "quote", not_found=False)
     return None
 
-def _fetch_finnhub_history(symbol, resolution='D', count=100):
-    """Fetch candles from Finnhub"""
+def _history_window_seconds(resolution, count):
+    """Calendar seconds covering `count` bars (for daily bars, `count` calendar days)"""
+    if resolution in intraday.RESOLUTIONS:
+        return intraday.window_seconds(intraday.RESOLUTIONS[resolution], count)
+    return count * 86400 * {'D': 1, 'W': 7, 'M': 31}[resolution]
+
+@traced("fetch")
+def _fetch_intraday_bars(symbol, resolution='5', count=None, refresh=False):
+    """
+    The last `count` intraday bars (all cached ones if None) at `resolution`
+    minutes, downsampled from the cached INTRADAY_BASE_RESOLUTION series.
+    A refresh only fetches bars newer than the cached ones.
+    """
+    if not FINNHUB_API_KEY: return None
+    base = INTRADAY_BASE_RESOLUTION
+    seconds, base_seconds = intraday.RESOLUTIONS[resolution], intraday.RESOLUTIONS[base]
+    if seconds < base_seconds or seconds % base_seconds:
+        raise ValueError(f"{resolution}-minute bars can't be built from {base}-minute bars")
+    cache_key = f"intraday_{base}"
+
+    def fetch():
+        cached, _, _ = _read_cache(symbol, cache_key)
+        end = int(time.time())
+        start = end - INTRADAY_HISTORY_DAYS * 86400
+        if cached is not None and len(cached):
+            start = max(start, int(cached.t[-1]))
+        headers = {'User-Agent': 'Mozilla/5.0'}
+        for i in range(3):
+            try:
+                url = f"{FINNHUB_BASE_URL}/stock/candle?symbol={symbol}&resolution={base}&from={start}&to={end}&token={FINNHUB_API_KEY}"
+                r = _http_get(url, headers=headers, timeout=10)
+                if r.status_code == 200:
+                    data = r.json()
+                    if data.get('s') == 'no_data':
+                        # Nothing new (e.g. market closed) for a symbol we already have
+                        if cached is not None: return cached
+                        raise SymbolNotFound(symbol)
+                    if data.get('s') == 'ok':
+                        bars = intraday.Bars.from_candles(base_seconds, data)
+                        if cached is None: return bars.tail(INTRADAY_MAX_BARS)
+                        return cached.merge(bars, INTRADAY_MAX_BARS)
+                if r.status_code == 429: _sleep(2)
+            except SymbolNotFound:
+                raise
+            except Exception:
+                _sleep(1)
+        return None
+
+    bars = _cached_fetch(symbol, cache_key, fetch, validity_hours=INTRADAY_CACHE_MINUTES / 60, refresh=refresh)
+    if bars is None: return None
+    if count is not None:
+        # Enough base bars to fill `count` bars at `resolution`, plus one partial bucket
+        bars = bars.tail((count + 1) * (seconds // base_seconds))
+    bars = bars.downsample(seconds)
+    return bars.tail(count) if count is not None else bars
+
+@traced("fetch")
+def _fetch_finnhub_history(symbol, resolution='D', count=100, refresh=False):
+    """Fetch candles from Finnhub (`count` calendar days for daily bars, else bars)"""
     if not FINNHUB_API_KEY: return None
-    cache_key = f"history_finnhub_{resolution}_{count}"
-    cached = load_cache(symbol, cache_key)
-    if cached is not None: return cached
+    if resolution in intraday.RESOLUTIONS:
+        bars = _fetch_intraday_bars(symbol, resolution, count, refresh=refresh)
+        return bars.to_frame() if bars is not None else None
+    # Windows up to HISTORY_WINDOW_DAYS share one cached series and are sliced
+    # by date, so every tool (and the prefetcher) hits the same cache entry
+    if count <= HISTORY_WINDOW_DAYS:
+        fetch_count = HISTORY_WINDOW_DAYS
+        cache_key = f"history_finnhub_{resolution}"
+    else:
+        fetch_count = count
+        cache_key = f"history_finnhub_{resolution}_{count}"
+    cutoff = datetime.now() - timedelta(seconds=_history_window_seconds(resolution, count))
+
+    def fetch():
+        headers = {'User-Agent': 'Mozilla/5.0'}
+        for i in range(3):
+            try:
+                end = int(time.time())
+                start = end - _history_window_seconds(resolution, fetch_count)
+                
+                url = f"{FINNHUB_BASE_URL}/stock/candle?symbol={symbol}&resolution={resolution}&from={start}&to={end}&token={FINNHUB_API_KEY}"
+                r = _http_get(url, headers=headers, timeout=10)
+                if r.status_code == 200:
+                    data = r.json()
+                    if data.get('s') == 'no_data': raise SymbolNotFound(symbol)
+                    if data.get('s') == 'ok':
+                        df = pd.DataFrame({
+                            'Open': data['o'],
+                            'High': data['h'],
+                            'Low': data['l'],
+                            'Close': data['c'],
+                            'Volume': data['v'],
+                            'Date': [datetime.fromtimestamp(ts) for ts in data['t']]
+                        })
+                        df.set_index('Date', inplace=True)
+                        return df
+                if r.status_code == 429: _sleep(2)
+            except SymbolNotFound:
+                raise
+            except Exception:
+                _sleep(1)
+        return None
+
+    df = _cached_fetch(symbol, cache_key, fetch, refresh=refresh)
+    if df is None: return None
+    return df[df.index >= cutoff]
+
+@traced("fetch")
+def _fetch_av_overview(symbol, refresh=False):
+    """Fetch Company Overview from Alpha Vantage"""
+    if not ALPHA_VANTAGE_API_KEY: return None
 
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    for i in range(3):
+    def fetch():
+        url = f"{ALPHA_VANTAGE_BASE_URL}/query?function=OVERVIEW&symbol={symbol}&apikey={ALPHA_VANTAGE_API_KEY}"
         try:
-            end = int(time.time())
-            start = end - (count * 86400 * (1 if resolution=='D' else 7)) 
-            
-            url = f"https://finnhub.io/api/v1/stock/candle?symbol={symbol}&resolution={resolution}&from={start}&to={end}&token={FINNHUB_API_KEY}"
-            r = requests.get(url, headers=headers, timeout=10)
+            r = _http_get(url, timeout=10)
             if r.status_code == 200:
                 data = r.json()
-                if data.get('s') == 'ok':
-                    df = pd.DataFrame({
-                        'Open': data['o'],
-                        'High': data['h'],
-                        'Low': data['l'],
-                        'Close': data['c'],
-                        'Volume': data['v'],
-                        'Date': [datetime.fromtimestamp(ts) for ts in data['t']]
-                    })
-                    df.set_index('Date', inplace=True)
-                    save_cache(symbol, cache_key, df)
-                    return df
-            if r.status_code == 429: time.sleep(2)
+                if "Symbol" in data:
+                    return data
+                # Unknown symbols come back as {}; rate-limit notes carry a message
+                if not data: raise SymbolNotFound(symbol)
+        except SymbolNotFound:
+            raise
         except Exception:
-            time.sleep(1)
-    return None
-
-def _fetch_av_overview(symbol):
-    """Fetch Company Overview from Alpha Vantage"""
-    if not ALPHA_VANTAGE_API_KEY: return None
-    cached = load_cache(symbol, "av_overview", validity_hours=168)
-    if cached: return cached
+            pass
+        return None
 
-    url = f"https://www.alphavantage.co/query?function=OVERVIEW&symbol={symbol}&apikey={ALPHA_VANTAGE_API_KEY}"
-    try:
-        r = requests.get(url, timeout=10)
-        if r.status_code == 200:
-            data = r.json()
-            if "Symbol" in data:
-                save_cache(symbol, "av_overview", data)
-                return data
-    except Exception:
-        pass
-    return None
+    return _cached_fetch(symbol, "av_overview", fetch, validity_hours=168, refresh=refresh)
 
-def _fetch_av_history(symbol):
+@traced("fetch")
+def _fetch_av_history(symbol, refresh=False):
     """Fetch Daily History from Alpha Vantage (Fallback)"""
     if not ALPHA_VANTAGE_API_KEY: return None
-    cached = load_cache(symbol, "av_history_daily")
-    if cached is not None: return cached
-    
-    url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={symbol}&apikey={ALPHA_VANTAGE_API_KEY}"
-    try:
-        r = requests.get(url, timeout=10)
-        if r.status_code == 200:
-            data = r.json()
-            ts = data.get("Time Series (Daily)", {})
-            if not ts: return None
-            
-            records = []
-            for date_str, values in ts.items():
-                records.append({
-                    'Date': datetime.strptime(date_str, "%Y-%m-%d"),
-                    'Open': float(values['1. open']),
-                    'High': float(values['2. high']),
-                    'Low': float(values['3. low']),
-                    'Close': float(values['4. close']),
-                    'Volume': float(values['5. volume'])
-                })
-            df = pd.DataFrame(records)
-            df.set_index('Date', inplace=True)
-            df.sort_index(inplace=True)
-            
-            save_cache(symbol, "av_history_daily", df)
-            return df
-    except Exception:
-        pass
-    return None
+
+    def fetch():
+        url = f"{ALPHA_VANTAGE_BASE_URL}/query?function=TIME_SERIES_DAILY&symbol={symbol}&apikey={ALPHA_VANTAGE_API_KEY}"
+        try:
+            r = _http_get(url, timeout=10)
+            if r.status_code == 200:
+                data = r.json()
+                if "Error Message" in data: raise SymbolNotFound(symbol)
+                ts = data.get("Time Series (Daily)", {})
+                if not ts: return None
+                
+                records = []
+                for date_str, values in ts.items():
+                    records.append({
+                        'Date': datetime.strptime(date_str, "%Y-%m-%d"),
+                        'Open': float(values['1. open']),
+                        'High': float(values['2. high']),
+                        'Low': float(values['3. low']),
+                        'Close': float(values['4. close']),
+                        'Volume': float(values['5. volume'])
+                    })
+                df = pd.DataFrame(records)
+                df.set_index('Date', inplace=True)
+                df.sort_index(inplace=True)
+                return df
+        except SymbolNotFound:
+            raise
+        except Exception:
+            pass
+        return None
+
+    return _cached_fetch(symbol, "av_history_daily", fetch, refresh=refresh)
 
 def _get_hybrid_history(symbol, days):
     """Helper to get history from Finnhub or AV"""
@@ -159,33 +441,69 @@ def _get_hybrid_history(symbol, days):
             hist = hist.tail(days)
     return hist
 
-# Logic Wrappers for Output Formatting
-def _logic_fetch_news(symbol):
-    try:
-        if not FINNHUB_API_KEY: return "Finnhub API key missing."
-        url = f"https://finnhub.io/api/v1/company-news"
+def _get_bars(symbol, resolution, count):
+    """OHLCV history: `count` calendar days of daily bars for 'D', else the last `count` intraday bars"""
+    if resolution == 'D':
+        return _get_hybrid_history(symbol, count)
+    if resolution not in intraday.RESOLUTIONS:
+        raise ValueError(f"Unsupported resolution {resolution!r} (use D, {', '.join(intraday.RESOLUTIONS)})")
+    bars = _fetch_intraday_bars(symbol, resolution, count)
+    return bars.to_frame() if bars is not None else None
+
+def _bar_label(resolution):
+    return "Day" if resolution == 'D' else "Bar"
+
+def _resolution_note(resolution):
+    return "" if resolution == 'D' else f" ({resolution}-minute bars)"
+
+@traced("fetch")
+def _fetch_finnhub_news(symbol, refresh=False):
+    """
+    Company news store for a symbol (see tools/news_store.py), topped up
+    from Finnhub with only the days since the newest stored article.
+    """
+    if not FINNHUB_API_KEY: return None
+
+    def fetch():
+        store, _, _ = _read_cache(symbol, "news_store")
+        url = f"{FINNHUB_BASE_URL}/company-news"
+        since = news_store.window_start(store)
         params = {
             "symbol": symbol,
-            "from": (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d'),
-            "to": datetime.now().strftime('%Y-%m-%d'),
+            "from": since,
+            "to": datetime.now(timezone.utc).strftime('%Y-%m-%d'),
             "token": FINNHUB_API_KEY
         }
         headers = {'User-Agent': 'Mozilla/5.0'}
         for i in range(3):
             try:
-                r = requests.get(url, params=params, headers=headers, timeout=10)
+                r = _http_get(url, params=params, headers=headers, timeout=10)
                 if r.status_code == 200:
-                    news = r.json()
-                    summary = f"{symbol} - Latest News:\n"
-                    # Limit to 5
-                    for a in news[:5]:
-                        headline = a.get('headline')
-                        dt = a.get('datetime')
-                        summary += f"- {headline} ({dt})\n"
-                    return summary
-                time.sleep(1)
-            except: time.sleep(1)
-        return "Failed to fetch news."
+                    articles = r.json()
+                    merged = news_store.merge(store, articles, since=since)
+                    metrics.NEWS_ARTICLES.inc(merged["added"], result="new")
+                    metrics.NEWS_ARTICLES.inc(len(articles) - merged["added"], result="skipped")
+                    return merged
+                _sleep(1)
+            except Exception:
+                _sleep(1)
+        return None
+
+    return _cached_fetch(symbol, "news_store", fetch, validity_hours=NEWS_CACHE_HOURS, refresh=refresh)
+
+# Logic Wrappers for Output Formatting
+def _logic_fetch_news(symbol):
+    try:
+        if not FINNHUB_API_KEY: return "Finnhub API key missing."
+        store = _fetch_finnhub_news(symbol)
+        if store is None: return "Failed to fetch news."
+        articles = news_store.top_articles(store, symbol, NEWS_TOP_N)
+        if not articles: return f"{symbol} - No news in the last {news_store.searched_days(store)} days."
+        summary = f"{symbol} - Latest News:\n"
+        for a in articles:
+            source = f"{a['source']}, " if a.get('source') else ""
+            summary += f"- {a['headline']} ({source}{news_store.format_time(a['datetime'])})\n"
+        return summary
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -233,11 +551,13 @@ def _logic_fetch_stock_price(symbol):
 # ============= TOOLS IMPLEMENTATION =============
 
 @tool("fetch_stock_price")
+@traced("tool")
 def fetch_stock_price(symbol: str) -> str:
     """Fetch current stock price and basic info."""
     return _logic_fetch_stock_price(symbol)
 
 @tool("fetch_stock_history")
+@traced("tool")
 def fetch_stock_history(symbol: str, period: str = "3mo") -> str:
     """Fetch historical stock price data."""
     try:
@@ -271,13 +591,25 @@ def fetch_stock_history(symbol: str, period: str = "3mo") -> str:
     except Exception as e:
         return f"Error fetching history for {symbol}: {str(e)}"
 
+def _peer_index(symbols):
+    """
+    The fundamentals index, rescanned once if any of `symbols` (whose
+    overviews the caller has just fetched) isn't in it yet.
+    """
+    index = get_index()
+    if any(s not in index for s in symbols):
+        index = get_index(refresh=True)
+    return index
+
 @tool("fetch_fundamentals")
+@traced("tool")
 def fetch_fundamentals(symbol: str) -> str:
     """Fetch fundamental financial data."""
     try:
         data = _fetch_av_overview(symbol)
         if not data:
             return f"Error: Could not fetch fundamentals for {symbol}"
+        peers = _peer_index([symbol]).compare(symbol)
         
         return f"""
         {symbol} - Fundamentals:
@@ -288,87 +620,84 @@ def fetch_fundamentals(symbol: str) -> str:
         Revenue (TTM): ${int(data.get('RevenueTTM', 0)):,}
         Profit Margin: {data.get('ProfitMargin', 'N/A')}
         Building Sector: {data.get('Sector', 'N/A')}
+
+        {format_comparison(peers) if peers else 'Peers: N/A (no cached peer data)'}
         """
     except Exception as e:
         return f"Error fetching fundamentals for {symbol}: {str(e)}"
 
 @tool("calculate_moving_averages")
-def calculate_moving_averages(symbol: str) -> str:
-    """Calculate moving averages."""
+@traced("tool")
+def calculate_moving_averages(symbol: str, resolution: str = "D") -> str:
+    """Calculate moving averages. `resolution`: D (daily) or 1, 5, 15, 30, 60 (minute bars)."""
     try:
         # Increase count to 400 to ensure 200MA has enough data
-        hist = _get_hybrid_history(symbol, 400)
+        hist = _get_bars(symbol, resolution, 400 if resolution == 'D' else 200)
         
         if hist is None or hist.empty:
             return f"Error: Could not fetch historical data for {symbol}"
 
-        closes = hist['Close']
-        current = closes.iloc[-1]
-        
-        ma20 = closes.rolling(window=20).mean().iloc[-1] if len(hist) >= 20 else 0
-        ma50 = closes.rolling(window=50).mean().iloc[-1] if len(hist) >= 50 else 0
-        ma200 = closes.rolling(window=200).mean().iloc[-1] if len(hist) >= 200 else 0
-        
-        if hasattr(ma20, 'item'): ma20 = ma20.item()
-        if hasattr(ma50, 'item'): ma50 = ma50.item()
-        if hasattr(ma200, 'item'): ma200 = ma200.item()
-        if hasattr(current, 'item'): current = current.item()
+        with span("moving_averages", "compute", symbol=symbol, rows=len(hist)):
+            closes = hist['Close'].to_numpy(dtype=np.float64)
+            offsets = indicators.single(closes)
+            current = float(closes[-1])
+            
+            ma20 = float(indicators.moving_average_last(closes, offsets, 20)[0])
+            ma50 = float(indicators.moving_average_last(closes, offsets, 50)[0])
+            ma200 = float(indicators.moving_average_last(closes, offsets, 200)[0])
 
+        unit = _bar_label(resolution)
         return f"""
-        {symbol} - Moving Averages:
+        {symbol} - Moving Averages{_resolution_note(resolution)}:
         Current Price: ${current:.2f}
-        20-Day MA: ${ma20:.2f}
-        50-Day MA: ${ma50:.2f}
-        200-Day MA: ${ma200:.2f}
+        20-{unit} MA: ${ma20:.2f}
+        50-{unit} MA: ${ma50:.2f}
+        200-{unit} MA: ${ma200:.2f}
         """
     except Exception as e:
         return f"Error calculating MAs for {symbol}: {str(e)}"
 
 @tool("calculate_rsi")
-def calculate_rsi(symbol: str, period: int = 14) -> str:
-    """Calculate RSI."""
+@traced("tool")
+def calculate_rsi(symbol: str, period: int = 14, resolution: str = "D") -> str:
+    """Calculate RSI. `resolution`: D (daily) or 1, 5, 15, 30, 60 (minute bars)."""
     try:
-        hist = _get_hybrid_history(symbol, 90)
+        hist = _get_bars(symbol, resolution, 90)
 
         if hist is None or hist.empty: return "Error: No data"
 
-        delta = hist['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        # Handle case where all are NaN at start
-        current_rsi = rsi.iloc[-1]
-        if hasattr(current_rsi, 'item'): current_rsi = current_rsi.item()
+        with span("rsi", "compute", symbol=symbol, rows=len(hist)):
+            closes = hist['Close'].to_numpy(dtype=np.float64)
+            # NaN when there are fewer than `period` bars
+            current_rsi = float(indicators.rsi_last(closes, indicators.single(closes), period)[0])
         
         return f"""
-        {symbol} - RSI ({period}-period):
+        {symbol} - RSI ({period}-period){_resolution_note(resolution)}:
         Current RSI: {current_rsi:.2f}
         """
     except Exception as e:
         return f"Error calculating RSI: {str(e)}"
 
 @tool("calculate_support_resistance")
-def calculate_support_resistance(symbol: str) -> str:
-    """Identify support and resistance levels."""
+@traced("tool")
+def calculate_support_resistance(symbol: str, resolution: str = "D") -> str:
+    """Identify support and resistance levels. `resolution`: D (daily) or 1, 5, 15, 30, 60 (minute bars)."""
     try:
-        hist = _get_hybrid_history(symbol, 365)
+        hist = _get_bars(symbol, resolution, 365 if resolution == 'D' else 90)
         if hist is None or hist.empty:
             return f"Error: No data for {symbol}"
         
         current = hist['Close'].iloc[-1]
         if hasattr(current, 'item'): current = current.item()
         
-        window = hist.tail(90)
-        resistance = window['High'].max()
-        support = window['Low'].min()
-        
-        if hasattr(resistance, 'item'): resistance = resistance.item()
-        if hasattr(support, 'item'): support = support.item()
+        with span("support_resistance", "compute", symbol=symbol, rows=len(hist)):
+            high = hist['High'].to_numpy(dtype=np.float64)
+            low = hist['Low'].to_numpy(dtype=np.float64)
+            support, resistance = indicators.support_resistance(high, low, indicators.single(high), 90)
+            support, resistance = float(support[0]), float(resistance[0])
         
         return f"""
-        {symbol} - Support & Resistance (90-day):
+        {symbol} - Support & Resistance (90-{_bar_label(resolution).lower()}){_resolution_note(resolution)}:
         Current Price: ${current:.2f}
         Resistance (High): ${resistance:.2f}
         Support (Low): ${support:.2f}
@@ -379,16 +708,19 @@ def calculate_support_resistance(symbol: str) -> str:
          return f"Error: {e}"
 
 @tool("get_company_info")
+@traced("tool")
 def get_company_info(symbol: str) -> str:
     """Get company info."""
     return _logic_get_company_info(symbol)
 
 @tool("fetch_latest_news")
+@traced("tool")
 def fetch_latest_news(symbol: str) -> str:
     """Fetch news."""
     return _logic_fetch_news(symbol)
 
 @tool("fetch_market_summary")
+@traced("tool")
 def fetch_market_summary(symbol: str) -> str:
     """
     Fetch comprehensive market data including news, company info, and price.
@@ -413,21 +745,25 @@ def fetch_market_summary(symbol: str) -> str:
         return f"Error fetching market summary: {e}"
 
 @tool("compare_stocks")
+@traced("tool")
 def compare_stocks(symbols: str) -> str:
     """Compare multiple stocks."""
     try:
         symbol_list = [s.strip().upper() for s in symbols.split(',')]
-        res = "Stock Comparison:\nSymbol | Price | Change | PE Ratio\n"
+        res = "Stock Comparison:\nSymbol | Price | Change | PE Ratio | PE vs Peers\n"
         
-        for sym in symbol_list:
-            price_data = _fetch_finnhub_price(sym)
-            av_data = _fetch_av_overview(sym)
-            
+        rows = [(sym, _fetch_finnhub_price(sym), _fetch_av_overview(sym)) for sym in symbol_list]
+        index = _peer_index([sym for sym, _, av_data in rows if av_data])
+        
+        for sym, price_data, av_data in rows:
+            peers = index.compare(sym) if av_data else None
             p = price_data['currentPrice'] if price_data else 0
             c = price_data['changePercent'] if price_data else 0
             pe = av_data.get('PERatio', 'N/A') if av_data else 'N/A'
+            pe_peers = peers and peers['metrics'].get('pe')
+            rank = f"percentile {pe_peers['percentile']:.0f} in {peers['group']}" if pe_peers and pe_peers['percentile'] is not None else 'N/A'
             
-            res += f"{sym:<6} | ${p:<6.2f} | {c:<6.2f}% | {pe}\n"
+            res += f"{sym:<6} | ${p:<6.2f} | {c:<6.2f}% | {pe} | {rank}\n"
         return res
     except Exception as e:
         return f"Error: {str(e)}"
@@ -0,0 +1,277 @@
+# tools/fundamentals_index.py
+"""
+Peer index over the cached Alpha Vantage overviews (`*_av_overview.pkl`).
+
+Every cached symbol's valuation and profitability metrics are kept in one
+array, grouped by sector and by industry, with the sorted values and
+quartiles of each group precomputed. Peer-relative valuation is then an
+in-memory lookup instead of one rate-limited OVERVIEW call per peer. The
+index covers whatever overviews are cached, so prefetching a wider universe
+(`python prefetch.py --symbols ...`) widens the peer groups.
+
+The index is rebuilt when overview files change (checked at most every
+CHECK_SECONDS); only new or updated files are re-read.
+"""
+import argparse
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from config import CACHE_DIR
+
+# Index field -> Alpha Vantage OVERVIEW field
+METRICS = {
+    "pe": "PERatio",
+    "pb": "PriceToBookRatio",
+    "profit_margin": "ProfitMargin",
+    "operating_margin": "OperatingMarginTTM",
+    "eps_growth": "QuarterlyEarningsGrowthYOY",
+}
+LABELS = {
+    "pe": "P/E",
+    "pb": "P/B",
+    "profit_margin": "Profit Margin",
+    "operating_margin": "Operating Margin",
+    "eps_growth": "EPS Growth (YoY)",
+}
+
+# Compare against the industry when it has this many symbols, else the sector
+MIN_PEERS = 3
+
+# Seconds between checks of the cache directory for new or updated overviews
+CHECK_SECONDS = 60
+
+_SUFFIX = "_av_overview.pkl"
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return np.nan  # "None", "-", missing
+    return number if np.isfinite(number) else np.nan
+
+def _row(overview: dict):
+    """(sector, industry, metric values) of one overview."""
+    values = [_number(overview.get(field)) for field in METRICS.values()]
+    return (
+        (overview.get("Sector") or "").strip().upper() or None,
+        (overview.get("Industry") or "").strip().upper() or None,
+        np.array(values, dtype=np.float64),
+    )
+
+class FundamentalsIndex:
+    """Metrics per symbol, grouped by sector and industry, with sorted values per group."""
+
+    def __init__(self, rows: dict):
+        """`rows` maps symbol -> (sector, industry, metric values) as built by `_row`."""
+        self.symbols = sorted(rows)
+        self._position = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.sectors = [rows[s][0] for s in self.symbols]
+        self.industries = [rows[s][1] for s in self.symbols]
+        self.values = (
+            np.vstack([rows[s][2] for s in self.symbols])
+            if self.symbols else np.empty((0, len(METRICS)))
+        )
+        self.groups = {}
+        for level, names in (("sector", self.sectors), ("industry", self.industries)):
+            members = {}
+            for i, name in enumerate(names):
+                if name is not None:
+                    members.setdefault(name, []).append(i)
+            for name, idx in members.items():
+                self.groups[(level, name)] = self._group(np.array(idx))
+
+    def _group(self, idx):
+        values = self.values[idx]
+        group = {"members": idx, "sorted": {}, "stats": {}}
+        for j, metric in enumerate(METRICS):
+            column = np.sort(values[:, j][~np.isnan(values[:, j])])
+            group["sorted"][metric] = column
+            if len(column):
+                p25, p50, p75 = np.percentile(column, (25, 50, 75))
+                group["stats"][metric] = {"count": len(column), "p25": p25, "median": p50, "p75": p75}
+        return group
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self._position
+
+    def peer_group(self, symbol: str):
+        """`(level, name)` a symbol is compared against: its industry if large enough, else its sector."""
+        i = self._position.get(symbol.upper())
+        if i is None:
+            return None
+        industry = ("industry", self.industries[i])
+        if industry in self.groups and len(self.groups[industry]["members"]) >= MIN_PEERS:
+            return industry
+        sector = ("sector", self.sectors[i])
+        return sector if sector in self.groups else None
+
+    def peers(self, symbol: str, level: str = None) -> list:
+        """Other symbols in the symbol's peer group (or its `sector`/`industry`)."""
+        symbol = symbol.upper()
+        i = self._position.get(symbol)
+        if i is None:
+            return []
+        if level is None:
+            key = self.peer_group(symbol)
+        else:
+            key = (level, (self.sectors if level == "sector" else self.industries)[i])
+        if key not in self.groups:
+            return []
+        return [self.symbols[j] for j in self.groups[key]["members"] if j != i]
+
+    def percentile(self, key, metric: str, value: float):
+        """Percentile rank (0-100) of `value` among group `key`'s values; ties count half."""
+        column = self.groups[key]["sorted"][metric]
+        if not len(column) or np.isnan(value):
+            return None
+        below = np.searchsorted(column, value, side="left")
+        equal = np.searchsorted(column, value, side="right") - below
+        return 100.0 * (below + 0.5 * equal) / len(column)
+
+    def compare(self, symbol: str):
+        """
+        Peer-relative metrics for a symbol: per metric its value, percentile
+        rank and the group's quartiles. None if the symbol isn't indexed.
+        """
+        symbol = symbol.upper()
+        key = self.peer_group(symbol)
+        if key is None:
+            return None
+        group = self.groups[key]
+        row = self.values[self._position[symbol]]
+        metrics = {}
+        for j, metric in enumerate(METRICS):
+            if metric not in group["stats"]:
+                continue
+            value = row[j]
+            metrics[metric] = {
+                "value": None if np.isnan(value) else float(value),
+                "percentile": self.percentile(key, metric, value),
+                **{k: float(v) if k != "count" else v for k, v in group["stats"][metric].items()},
+            }
+        return {
+            "symbol": symbol,
+            "level": key[0],
+            "group": key[1],
+            "peers": self.peers(symbol),
+            "metrics": metrics,
+        }
+
+    def sector_table(self, level: str = "sector") -> dict:
+        """Quartiles per metric for every sector (or industry)."""
+        return {
+            name: {"symbols": len(group["members"]), **group["stats"]}
+            for (lvl, name), group in sorted(self.groups.items())
+            if lvl == level
+        }
+
+# symbol -> (mtime, row), reused across rebuilds
+_rows = {}
+_index = None
+_checked = 0.0
+_lock = threading.Lock()
+
+def _scan(cache_dir):
+    """
+    SYMBOL -> (mtime, file name) of every cached overview. Symbols are
+    upper-cased, as the index lookups are.
+    """
+    found = {}
+    try:
+        entries = os.scandir(cache_dir)
+    except FileNotFoundError:
+        return found
+    with entries:
+        for entry in entries:
+            if entry.name.endswith(_SUFFIX):
+                found[entry.name[:-len(_SUFFIX)].upper()] = (entry.stat().st_mtime, entry.name)
+    return found
+
+def _load(path):
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        return data if isinstance(data, dict) else None
+    except Exception:
+        return None
+
+def get_index(refresh: bool = False, cache_dir: str = CACHE_DIR) -> FundamentalsIndex:
+    """The index over the cached overviews, rebuilt if any were added, updated or removed."""
+    global _index, _checked
+    with _lock:
+        now = time.monotonic()
+        if _index is not None and not refresh and now - _checked < CHECK_SECONDS:
+            return _index
+        _checked = now
+        found = _scan(cache_dir)
+        changed = set(found) != set(_rows) or any(_rows[s][0] != m for s, (m, _) in found.items())
+        if _index is not None and not changed:
+            return _index
+        for symbol in list(_rows):
+            if symbol not in found:
+                del _rows[symbol]
+        for symbol, (mtime, name) in found.items():
+            if symbol in _rows and _rows[symbol][0] == mtime:
+                continue
+            overview = _load(os.path.join(cache_dir, name))
+            if overview is None:
+                _rows.pop(symbol, None)
+                continue
+            _rows[symbol] = (mtime, _row(overview))
+        _index = FundamentalsIndex({symbol: row for symbol, (_, row) in _rows.items()})
+        return _index
+
+def _format_value(metric, value):
+    if value is None:
+        return "N/A"
+    if metric in ("pe", "pb"):
+        return f"{value:.2f}"
+    return f"{value * 100:.1f}%"
+
+def format_comparison(comparison: dict) -> str:
+    """Text table of `FundamentalsIndex.compare` output, for the agents."""
+    peers = comparison["peers"]
+    shown = ", ".join(peers[:10]) + (f" (+{len(peers) - 10} more)" if len(peers) > 10 else "")
+    lines = [
+        f"{comparison['symbol']} vs {comparison['level']} peers: {comparison['group']} ({len(peers)} peers: {shown or 'none'})",
+        "Metric | Value | Percentile in Group | Group Median | Group 25th-75th",
+    ]
+    for metric, m in comparison["metrics"].items():
+        pct = f"{m['percentile']:.0f}" if m["percentile"] is not None else "N/A"
+        lines.append(
+            f"{LABELS[metric]} | {_format_value(metric, m['value'])} | {pct} | "
+            f"{_format_value(metric, m['median'])} | "
+            f"{_format_value(metric, m['p25'])} - {_format_value(metric, m['p75'])}"
+        )
+    return "\n".join(lines)
+
+def main():
+    """CLI entry point: show sector quartiles, or one symbol's peer comparison."""
+    parser = argparse.ArgumentParser(description="Fundamentals peer index over cached overviews")
+    parser.add_argument("--symbol", help="Show this symbol's peer comparison")
+    parser.add_argument("--level", choices=("sector", "industry"), default="sector")
+    args = parser.parse_args()
+
+    index = get_index(refresh=True)
+    print(f"Indexed {len(index)} symbols from {CACHE_DIR}")
+    if args.symbol:
+        comparison = index.compare(args.symbol)
+        print(format_comparison(comparison) if comparison else f"{args.symbol.upper()} has no cached overview")
+        return
+    for name, stats in index.sector_table(args.level).items():
+        print(f"\n{name} ({stats['symbols']} symbols)")
+        for metric in METRICS:
+            if metric in stats:
+                s = stats[metric]
+                print(f"  {LABELS[metric]:<17} median {_format_value(metric, s['median']):>8}  "
+                      f"25th-75th {_format_value(metric, s['p25'])} - {_format_value(metric, s['p75'])}")
+
+if __name__ == "__main__":
+    main()
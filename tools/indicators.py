@@ -0,0 +1,167 @@
+# tools/indicators.py
+"""
+NumPy indicator kernels over many symbols at once.
+
+Price series for N symbols are packed end to end in flat arrays, with
+`offsets` (length N+1) marking where each symbol starts and ends
+(symbol i is `close[offsets[i]:offsets[i+1]]`). Every kernel works on the
+whole batch with cumulative sums / reductions, no per-symbol Python loop,
+and returns one value per symbol. Results match the pandas rolling
+calculations used by the tools.
+"""
+import numpy as np
+
+# Columns of the table returned by indicator_table()
+FIELDS = ("current", "ma20", "ma50", "ma200", "rsi", "support", "resistance")
+
+def _segment_bounds(offsets):
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return offsets[:-1], offsets[1:]
+
+def last_close(close, offsets):
+    starts, ends = _segment_bounds(offsets)
+    out = np.full(len(starts), np.nan)
+    has_data = ends > starts
+    out[has_data] = close[ends[has_data] - 1]
+    return out
+
+def _cumsums(values):
+    """
+    Prefix sums of `values` with NaNs counted as 0, and prefix counts of the
+    NaNs. A NaN then only affects the windows that contain it (which come
+    out NaN, as in pandas), not every later bar and symbol in the batch.
+    """
+    missing = np.isnan(values)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, values))))
+    nans = np.concatenate(([0], np.cumsum(missing)))
+    return csum, nans
+
+def _window_mean(csum, nans, ends, window):
+    """Mean of the `window` values before each index in `ends`; NaN if any of them is NaN."""
+    mean = (csum[ends] - csum[ends - window]) / window
+    return np.where(nans[ends] - nans[ends - window] > 0, np.nan, mean)
+
+def moving_average_last(close, offsets, window):
+    """Mean of the last `window` closes per symbol; 0 where history is shorter (as the tool reports)."""
+    starts, ends = _segment_bounds(offsets)
+    csum, nans = _cumsums(close)
+    out = np.zeros(len(starts))
+    ok = (ends - starts) >= window
+    out[ok] = _window_mean(csum, nans, ends[ok], window)
+    return out
+
+def rsi_last(close, offsets, period=14):
+    """
+    RSI from simple rolling means of gains and losses over `period` bars,
+    as in calculate_rsi. NaN where history is shorter than `period`.
+    """
+    starts, ends = _segment_bounds(offsets)
+    delta = np.empty_like(close)
+    delta[1:] = np.diff(close)
+    # First bar of each symbol has no previous close (pandas diff -> NaN -> 0)
+    delta[starts[ends > starts]] = 0.0
+    gain_sum = np.concatenate(([0.0], np.cumsum(np.where(delta > 0, delta, 0.0))))
+    loss_sum = np.concatenate(([0.0], np.cumsum(np.where(delta < 0, -delta, 0.0))))
+
+    out = np.full(len(starts), np.nan)
+    ok = (ends - starts) >= period
+    gain = (gain_sum[ends[ok]] - gain_sum[ends[ok] - period]) / period
+    loss = (loss_sum[ends[ok]] - loss_sum[ends[ok] - period]) / period
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[ok] = 100 - (100 / (1 + gain / loss))
+    return out
+
+def _window_reduce(ufunc, values, offsets, window):
+    """Apply `ufunc.reduceat` over the last `window` values of each symbol."""
+    starts, ends = _segment_bounds(offsets)
+    out = np.full(len(starts), np.nan)
+    ok = ends > starts
+    if not ok.any():
+        return out
+    lo = np.maximum(starts[ok], ends[ok] - window)
+    # reduceat over [lo0, end0, lo1, end1, ...]; even slots are the windows
+    bounds = np.empty(2 * len(lo), dtype=np.int64)
+    bounds[0::2] = lo
+    bounds[1::2] = ends[ok]
+    padded = np.append(values, values[-1])
+    out[ok] = ufunc.reduceat(padded, bounds)[0::2]
+    return out
+
+def support_resistance(high, low, offsets, window=90):
+    """
+    (support, resistance): lowest low and highest high of the last `window`
+    bars. Missing (NaN) bars are skipped, as pandas min/max do.
+    """
+    return (
+        _window_reduce(np.fmin, low, offsets, window),
+        _window_reduce(np.fmax, high, offsets, window),
+    )
+
+def indicator_table(close, high, low, offsets, rsi_period=14, sr_window=90):
+    """All indicators for every symbol as an (N, len(FIELDS)) float64 array."""
+    support, resistance = support_resistance(high, low, offsets, sr_window)
+    return np.column_stack([
+        last_close(close, offsets),
+        moving_average_last(close, offsets, 20),
+        moving_average_last(close, offsets, 50),
+        moving_average_last(close, offsets, 200),
+        rsi_last(close, offsets, rsi_period),
+        support,
+        resistance,
+    ])
+
+# ---- Full series (one value per bar), for backtesting ----
+
+def bar_positions(offsets):
+    """(segment id, index within its segment) for every bar in the flat arrays."""
+    starts, ends = _segment_bounds(offsets)
+    segment = np.repeat(np.arange(len(starts)), ends - starts)
+    return segment, np.arange(len(segment)) - starts[segment]
+
+def shift(values, offsets, fill=np.nan):
+    """Previous bar's value within each symbol (`fill` on each symbol's first bar)."""
+    out = np.empty_like(values, dtype=np.float64)
+    out[1:] = values[:-1]
+    starts, ends = _segment_bounds(offsets)
+    out[starts[ends > starts]] = fill
+    return out
+
+def rolling_mean(values, offsets, window):
+    """Trailing `window`-bar mean at every bar; NaN until a symbol has `window` bars."""
+    _, pos = bar_positions(offsets)
+    csum, nans = _cumsums(np.asarray(values, dtype=np.float64))
+    out = np.full(len(values), np.nan)
+    idx = np.nonzero(pos >= window - 1)[0]
+    out[idx] = _window_mean(csum, nans, idx + 1, window)
+    return out
+
+def rolling_rsi(close, offsets, period=14):
+    """RSI (as rsi_last) at every bar."""
+    delta = close - shift(close, offsets, fill=np.nan)
+    delta = np.nan_to_num(delta, nan=0.0)
+    gain = rolling_mean(np.where(delta > 0, delta, 0.0), offsets, period)
+    loss = rolling_mean(np.where(delta < 0, -delta, 0.0), offsets, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - (100 / (1 + gain / loss))
+
+def _rolling_reduce(ufunc, values, offsets, window):
+    _, pos = bar_positions(offsets)
+    out = np.full(len(values), np.nan)
+    if len(values) < window:
+        return out
+    # Windows ending at bar i are row i - window + 1 of the strided view;
+    # only rows that stay inside one symbol are kept
+    reduced = ufunc.reduce(np.lib.stride_tricks.sliding_window_view(values, window), axis=1)
+    idx = np.nonzero(pos >= window - 1)[0]
+    out[idx] = reduced[idx - window + 1]
+    return out
+
+def rolling_max(values, offsets, window):
+    return _rolling_reduce(np.maximum, values, offsets, window)
+
+def rolling_min(values, offsets, window):
+    return _rolling_reduce(np.minimum, values, offsets, window)
+
+def single(values):
+    """Offsets for a single symbol's series: `kernel(values, single(values))[0]`."""
+    return np.array([0, len(values)], dtype=np.int64)
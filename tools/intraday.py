@@ -0,0 +1,103 @@
+# tools/intraday.py
+"""
+Intraday OHLCV bars in compact arrays.
+
+One base series per symbol (INTRADAY_BASE_RESOLUTION, 1-minute by default)
+is fetched and cached; 5/15/30/60-minute bars are downsampled from it on
+demand, so each symbol is fetched and stored once whatever resolutions the
+tools ask for. Bars keep epoch-second timestamps and volumes as int64 and
+prices as float32 (32 bytes per bar against 48 in a float64 DataFrame),
+and a series never holds more than INTRADAY_MAX_BARS bars: older ones are
+dropped as new ones are merged in.
+"""
+import numpy as np
+import pandas as pd
+
+# Finnhub intraday resolutions -> bar length in seconds
+RESOLUTIONS = {"1": 60, "5": 300, "15": 900, "30": 1800, "60": 3600}
+
+# Regular US session: 6.5 hours
+SESSION_SECONDS = 6.5 * 3600
+
+class Bars:
+    """OHLCV bars of one symbol at one resolution, oldest first."""
+
+    __slots__ = ("seconds", "t", "open", "high", "low", "close", "volume")
+
+    def __init__(self, seconds, t, open, high, low, close, volume):
+        self.seconds = int(seconds)
+        self.t = np.asarray(t, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float32)
+        self.high = np.asarray(high, dtype=np.float32)
+        self.low = np.asarray(low, dtype=np.float32)
+        self.close = np.asarray(close, dtype=np.float32)
+        self.volume = np.asarray(volume, dtype=np.int64)
+
+    @classmethod
+    def from_candles(cls, seconds, data: dict):
+        """Bars from a Finnhub `stock/candle` response."""
+        return cls(seconds, data["t"], data["o"], data["h"], data["l"], data["c"],
+                   np.nan_to_num(np.asarray(data["v"], dtype=np.float64)))
+
+    def __len__(self):
+        return len(self.t)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__slots__[1:])
+
+    def _take(self, index):
+        return Bars(self.seconds, self.t[index], self.open[index], self.high[index],
+                    self.low[index], self.close[index], self.volume[index])
+
+    def tail(self, count: int):
+        return self._take(slice(max(0, len(self) - count), None))
+
+    def since(self, start: int):
+        """Bars at or after epoch second `start`."""
+        return self._take(slice(int(np.searchsorted(self.t, start)), None))
+
+    def downsample(self, seconds: int):
+        """
+        Bars of `seconds` (a multiple of this series' bar length), bucketed on
+        epoch time, so 60-minute bars run from :00 to :00.
+        """
+        if seconds == self.seconds or not len(self):
+            return Bars(seconds, self.t, self.open, self.high, self.low, self.close, self.volume)
+        if seconds < self.seconds or seconds % self.seconds:
+            raise ValueError(f"Cannot build {seconds}s bars from {self.seconds}s bars")
+        bucket = self.t - self.t % seconds
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], len(bucket)]
+        return Bars(
+            seconds,
+            bucket[starts],
+            self.open[starts],
+            np.maximum.reduceat(self.high, starts),
+            np.minimum.reduceat(self.low, starts),
+            self.close[ends - 1],
+            np.add.reduceat(self.volume, starts),
+        )
+
+    def merge(self, newer, max_bars: int):
+        """This series with `newer` bars appended (replacing overlapping times), capped to the last `max_bars`."""
+        keep = self.t < newer.t[0] if len(newer) else slice(None)
+        merged = Bars(
+            self.seconds,
+            *(np.concatenate([getattr(self, name)[keep], getattr(newer, name)])
+              for name in self.__slots__[1:])
+        )
+        return merged.tail(max_bars)
+
+    def to_frame(self) -> pd.DataFrame:
+        """OHLCV DataFrame shaped like the daily history (`Date` index, Open/High/Low/Close/Volume)."""
+        return pd.DataFrame(
+            {"Open": self.open, "High": self.high, "Low": self.low,
+             "Close": self.close, "Volume": self.volume},
+            index=pd.DatetimeIndex(pd.to_datetime(self.t, unit="s"), name="Date"),
+        )
+
+def window_seconds(seconds: int, count: int) -> int:
+    """Calendar seconds spanning `count` bars of `seconds` in regular sessions (weekends included)."""
+    sessions = max(1, int(np.ceil(count * seconds / SESSION_SECONDS)))
+    return int((sessions * 7 / 5 + 3) * 86400)
@@ -0,0 +1,120 @@
+# tools/news_store.py
+"""
+Per-symbol company news store.
+
+A store is a dict kept in the data cache (`{SYMBOL}_news_store.pkl`):
+`articles` newest first, `last_datetime`, the newest article time seen,
+and `covered_from`, the start of the first window fetched. Each Finnhub
+call only asks for the days since `last_datetime`. merge() skips articles
+older than that and those already stored by id or headline (the same
+story syndicated under another id counts as a duplicate). Articles older
+than NEWS_RETENTION_DAYS are dropped.
+"""
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import NEWS_RETENTION_DAYS
+
+# Window of the first fetch for a symbol (days)
+INITIAL_DAYS = 7
+
+# Most articles kept per symbol
+MAX_ARTICLES = 200
+
+# Ranking: an article's weight halves every RANK_HALF_LIFE_HOURS, and
+# headlines naming the symbol weigh SYMBOL_BOOST times more
+RANK_HALF_LIFE_HOURS = 24
+SYMBOL_BOOST = 1.5
+
+# Fields kept from a Finnhub article
+_FIELDS = ("id", "datetime", "headline", "source", "summary", "url", "related")
+
+def _headline_key(headline: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", headline.lower()).strip()
+
+def window_start(store, now: float = None) -> str:
+    """`from` date (YYYY-MM-DD, UTC) for the next fetch: the day of the newest stored article, at most INITIAL_DAYS back."""
+    now = now if now is not None else time.time()
+    start = now - INITIAL_DAYS * 86400
+    if store and store.get("last_datetime"):
+        start = max(start, store["last_datetime"])
+    return datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%d")
+
+def _day_start(day: str) -> float:
+    return datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+
+def merge(store, articles, now: float = None, since: str = None) -> dict:
+    """
+    New store with `articles` (a Finnhub company-news response for the
+    window starting on day `since`) added; the input store is not modified.
+    """
+    now = now if now is not None else time.time()
+    store = store or {"articles": [], "last_datetime": 0}
+    last_seen = store["last_datetime"]
+    covered_from = store.get("covered_from")
+    if since is not None:
+        covered_from = min(covered_from or now, _day_start(since))
+    kept = list(store["articles"])
+    ids = {a["id"] for a in kept if a.get("id") is not None}
+    headlines = {_headline_key(a["headline"]) for a in kept}
+    added = 0
+    for article in articles or []:
+        if not isinstance(article, dict) or not article.get("headline"):
+            continue
+        try:
+            stamp = int(article.get("datetime") or 0)
+        except (TypeError, ValueError):
+            continue
+        key = _headline_key(article["headline"])
+        # Same-second articles as the newest stored one can still be new; ids and headlines catch repeats
+        if stamp < last_seen or article.get("id") in ids or key in headlines:
+            continue
+        kept.append({**{f: article.get(f) for f in _FIELDS}, "datetime": stamp})
+        if article.get("id") is not None:
+            ids.add(article["id"])
+        headlines.add(key)
+        added += 1
+
+    cutoff = now - NEWS_RETENTION_DAYS * 86400
+    kept = sorted((a for a in kept if a["datetime"] >= cutoff), key=lambda a: a["datetime"], reverse=True)
+    return {
+        "articles": kept[:MAX_ARTICLES],
+        "last_datetime": max([last_seen] + [a["datetime"] for a in kept]),
+        "covered_from": covered_from,
+        "added": added,
+    }
+
+def searched_days(store, now: float = None) -> int:
+    """Days of news the store covers: since its first fetch window, at most NEWS_RETENTION_DAYS."""
+    now = now if now is not None else time.time()
+    start = (store or {}).get("covered_from") or now - INITIAL_DAYS * 86400
+    start = max(start, now - NEWS_RETENTION_DAYS * 86400)
+    return max(1, int((now - start) / 86400))
+
+def top_articles(store, symbol: str, n: int = 5, now: float = None) -> list:
+    """The `n` highest-ranked articles: recency-weighted, preferring headlines that name the symbol."""
+    if not store:
+        return []
+    now = now if now is not None else time.time()
+    mention = re.compile(rf"\b{re.escape(symbol.upper())}\b")
+
+    def score(article):
+        age_hours = max(0.0, now - article["datetime"]) / 3600
+        weight = 0.5 ** (age_hours / RANK_HALF_LIFE_HOURS)
+        return weight * (SYMBOL_BOOST if mention.search(article["headline"]) else 1.0)
+
+    return sorted(store["articles"], key=score, reverse=True)[:n]
+
+def format_time(stamp: int, now: float = None) -> str:
+    """Readable article time: `2025-01-02 14:30 UTC (3h ago)`."""
+    now = now if now is not None else time.time()
+    when = datetime.fromtimestamp(stamp, timezone.utc)
+    age = timedelta(seconds=max(0, int(now - stamp)))
+    if age < timedelta(hours=1):
+        ago = f"{age.seconds // 60}m ago"
+    elif age < timedelta(days=1):
+        ago = f"{age.seconds // 3600}h ago"
+    else:
+        ago = f"{age.days}d ago"
+    return f"{when.strftime('%Y-%m-%d %H:%M')} UTC ({ago})"
@@ -0,0 +1,34 @@
+# tools/rate_limit.py
+import threading
+import time
+
+class RateLimiter:
+    """
+    Token bucket allowing `per_minute` calls per minute, with bursts up to
+    that many. `acquire` blocks until a call is allowed (waiting with `sleep`,
+    which may raise to give up); 0 disables limiting.
+    """
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._tokens = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        rate = self.per_minute / 60.0
+        self._tokens = min(float(self.per_minute), self._tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    def acquire(self, sleep=time.sleep):
+        if self.per_minute <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * 60.0 / self.per_minute
+            sleep(wait)
@@ -0,0 +1,211 @@
+# worker.py
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from broker import connect
+from config import (
+    JOB_BROKER_URL,
+    JOB_VISIBILITY_TIMEOUT,
+    WORKER_HEARTBEAT_SECONDS,
+    CREW_POOL_SIZE,
+)
+from cancellation import CancelToken, JobCancelled, activate as activate_token
+from crew import CrewPool, finished_task_outputs
+from tool_loop import agent_loop_stats
+from profiling import Trace, activate, span
+from reports import save_report, save_partial_report, report_id
+
+# Seconds an idle slot waits before polling the broker again
+POLL_SECONDS = 1.0
+
+class Worker:
+    """
+    Consumes analysis jobs from the broker and runs them on a local crew pool.
+
+    One slot thread per pooled crew claims a job, runs it and writes the
+    outcome back. A heartbeat thread renews the leases of running jobs,
+    picks up cancellation requests and advertises the worker; if this
+    process dies, its leases expire and the jobs are retried by whichever
+    worker polls next.
+    """
+
+    def __init__(self, broker, concurrency: int = CREW_POOL_SIZE, worker_id: str = None):
+        self.broker = broker
+        self.concurrency = max(1, concurrency)
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.crew_pool = CrewPool(self.concurrency)
+        self.active = {}  # job id -> CancelToken
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._beat()
+        self._threads = [threading.Thread(target=self._heartbeat_loop, name="heartbeat", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._slot_loop, name=f"slot-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"[worker {self.id}] Started with {self.concurrency} crew(s)")
+        return self
+
+    def stop(self, timeout=None):
+        """Stop claiming jobs and wait for running ones to finish."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.broker.remove_worker(self.id)
+
+    def _beat(self):
+        with self._lock:
+            running = list(self.active)
+        self.broker.register_worker(self.id, {
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "concurrency": self.concurrency,
+            "running": running,
+            "completed": self.completed,
+            "failed": self.failed,
+        })
+        for job_id in self.broker.heartbeat(self.id, running, JOB_VISIBILITY_TIMEOUT):
+            print(f"[worker {self.id}] Lost lease on {job_id}; stopping it")
+            self._cancel(job_id, "lease lost")
+        for job_id in self.broker.cancel_requested(running):
+            self._cancel(job_id, "cancelled")
+
+    def _cancel(self, job_id: str, reason: str):
+        with self._lock:
+            token = self.active.get(job_id)
+        if token is not None:
+            token.cancel(reason)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(WORKER_HEARTBEAT_SECONDS):
+            try:
+                self._beat()
+            except Exception as e:
+                print(f"[worker {self.id}] Heartbeat failed: {e}")
+
+    def _slot_loop(self):
+        while not self._stop.is_set():
+            try:
+                requeued, failed = self.broker.requeue_expired()
+                if requeued or failed:
+                    print(f"[worker {self.id}] Expired leases: {requeued} requeued, {failed} failed")
+                job = self.broker.claim(self.id, JOB_VISIBILITY_TIMEOUT)
+            except Exception as e:
+                print(f"[worker {self.id}] Broker error: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(POLL_SECONDS)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        task_id, symbol = job.id, job.payload["symbol"]
+        trace = Trace(f"{symbol.upper()} {task_id}")
+        deadline_at = job.payload.get("deadline_at")
+        # Interactive deadlines are wall-clock from submission; batch ones run from now
+        token = CancelToken(deadline_at - time.time() if deadline_at is not None
+                            else job.payload.get("deadline_seconds"))
+        partial = []
+        agents = {}
+        with self._lock:
+            self.active[task_id] = token
+        try:
+            self.broker.update(task_id, {"status": "running", "started_at": datetime.now().isoformat()})
+            print(f"[{task_id}] Starting analysis for {symbol} (attempt {job.attempts})")
+            with activate(trace), activate_token(token):
+                token.check()
+                with self.crew_pool.checkout() as crew:
+                    inputs = {
+                        "stock_symbol": symbol.upper(),
+                        "analysis_date": datetime.now().strftime("%Y-%m-%d"),
+                    }
+                    try:
+                        with span("kickoff", "crew", symbol=symbol.upper()):
+                            result = crew.kickoff(inputs=inputs)
+                    except JobCancelled:
+                        partial = finished_task_outputs(crew)
+                        raise
+                    finally:
+                        agents = agent_loop_stats(crew)
+            report_filename = save_report(symbol, result)
+            # The result text stays in the archive; /status reads it back by report_id
+            fields = {
+                "status": "completed",
+                "report_file": report_filename,
+                "report_id": report_id(report_filename),
+                "timings": trace.summary(),
+                "agents": agents,
+            }
+        except JobCancelled as e:
+            print(f"[{task_id}] {e} after {len(partial)} task(s)")
+            try:
+                report_filename = save_partial_report(symbol, partial, e.reason)
+            except Exception as save_error:
+                print(f"[{task_id}] Could not save partial report: {save_error}")
+                report_filename = None
+            fields = {
+                "status": "cancelled",
+                "cancel_reason": e.reason,
+                "error": str(e),
+                "report_file": report_filename,
+                "report_id": report_id(report_filename) if report_filename else None,
+                "timings": trace.summary(),
+                "agents": agents,
+            }
+        except Exception as e:
+            print(f"[{task_id}] Error: {e}")
+            fields = {"status": "failed", "error": str(e), "timings": trace.summary(), "agents": agents}
+        finally:
+            with self._lock:
+                self.active.pop(task_id, None)
+
+        if self.broker.finish(task_id, self.id, fields):
+            with self._lock:
+                if fields["status"] == "completed":
+                    self.completed += 1
+                elif fields["status"] == "failed":
+                    self.failed += 1
+            print(f"[{task_id}] Analysis {fields['status']} for {symbol}")
+        else:
+            print(f"[{task_id}] Lease expired before completion; result discarded")
+
+def main():
+    """CLI entry point: run crews for jobs enqueued by the API."""
+    parser = argparse.ArgumentParser(description="Run analysis jobs from the job broker")
+    parser.add_argument("--broker", default=JOB_BROKER_URL, help="Broker URL (default: JOB_BROKER_URL from .env)")
+    parser.add_argument("--concurrency", type=int, default=CREW_POOL_SIZE, help="Crews (concurrent jobs) on this worker")
+    parser.add_argument("--id", help="Worker id (default: host-pid-random)")
+    args = parser.parse_args()
+
+    if not args.broker:
+        print("❌ No broker configured! Set JOB_BROKER_URL in .env or pass --broker.")
+        sys.exit(1)
+
+    worker = Worker(connect(args.broker), args.concurrency, args.id).start()
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    try:
+        while not stopping.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    print(f"[worker {worker.id}] Stopping; waiting for running jobs...")
+    worker.stop()
+
+if __name__ == "__main__":
+    main()